@@ -0,0 +1,130 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from loguru import logger
+
+from utils import write_gzip
+
+ARCHIVE_VERSION = 1
+
+
+class FetchMode:
+    LIVE = "live"  # Fetch from the network
+    RECORD = "record"  # Fetch from the network and archive every body
+    REPLAY = "replay"  # Serve archived bodies, never touch the network
+
+
+@dataclass
+class FetchArchive:
+    """Local snapshot of fetched source bodies for reproducible runs.
+
+    ``manifest.json`` holds the archive format version, the time of the
+    recording and, per URL or local path, the status and the gzip-compressed
+    body file under ``bodies/``. Replaying also pins the clock to the
+    recording time so date-templated source URLs resolve the same way.
+    """
+
+    path: str
+    mode: str = FetchMode.REPLAY
+    recorded_at: datetime.datetime = field(default_factory=datetime.datetime.now)
+    entries: dict[str, dict] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        if self.mode == FetchMode.RECORD:
+            os.makedirs(os.path.join(self.path, "bodies"), exist_ok=True)
+            return
+
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(
+                f"Archive {self.path} has version {manifest.get('version')}, "
+                f"expected {ARCHIVE_VERSION}"
+            )
+        self.recorded_at = datetime.datetime.fromisoformat(manifest["recorded_at"])
+        self.entries = manifest["entries"]
+        logger.info(
+            f"Replaying {len(self.entries)} bodies recorded at {self.recorded_at} from {self.path}"
+        )
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def now(self) -> datetime.datetime:
+        """Get the current time of the run, pinned to the recording when replaying."""
+        if self.mode == FetchMode.REPLAY:
+            return self.recorded_at
+        return datetime.datetime.now()
+
+    def record(self, url: str, status: int, body: str) -> None:
+        """Archive the outcome of fetching a URL.
+
+        Args:
+            url: The requested URL or local path
+            status: The final HTTP status, 0 if no response was received
+            body: The body returned to the caller
+        """
+        file = ""
+        if body:
+            file = "bodies/" + hashlib.sha1(url.encode("utf-8")).hexdigest() + ".txt.gz"
+            # Duplicate URLs may be fetched concurrently, see write_gzip
+            write_gzip(os.path.join(self.path, file), body)
+        with self._lock:
+            self.entries[url] = {"status": status, "file": file, "size": len(body)}
+
+    def replay(self, url: str) -> str:
+        """Get the archived body of a URL.
+
+        Args:
+            url: The requested URL or local path
+
+        Returns:
+            The archived body, empty if the URL failed or was never recorded
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            logger.warning(f"No archived body for {url}")
+            return ""
+        if not entry["file"]:
+            return ""
+        with gzip.open(os.path.join(self.path, entry["file"]), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def save(self) -> None:
+        """Write the manifest of a recording."""
+        if self.mode != FetchMode.RECORD:
+            return
+        with self._lock:
+            manifest = {
+                "version": ARCHIVE_VERSION,
+                "recorded_at": self.recorded_at.isoformat(),
+                "entries": dict(sorted(self.entries.items())),
+            }
+        with open(self._manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        logger.info(f"Recorded {len(manifest['entries'])} fetched bodies to {self.path}")
+
+
+def open_archive(mode: str, path: str) -> Optional[FetchArchive]:
+    """Open the archive for a fetch mode.
+
+    Args:
+        mode: One of the :class:`FetchMode` values
+        path: Directory of the archive
+
+    Returns:
+        The archive, or None when fetching live
+    """
+    if mode == FetchMode.LIVE:
+        return None
+    if mode not in (FetchMode.RECORD, FetchMode.REPLAY):
+        raise ValueError(f"Unknown fetch mode: {mode}")
+    return FetchArchive(path, mode)
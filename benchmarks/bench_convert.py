@@ -0,0 +1,117 @@
+"""Microbenchmark the cost of converting one share link per protocol.
+
+Times :func:`convert.v2ray_to_clash` on synthetic links of every scheme the
+codec registry reads, bypassing the convert cache. With ``--baseline`` the
+``convert.py`` of that git revision is timed on the same links as well and
+must produce the same proxies for every scheme it supports.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_convert.py --links 2000 --baseline HEAD~1
+"""
+
+import argparse
+import base64
+import os
+import subprocess
+import sys
+import time
+import types
+from urllib.parse import quote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import convert  # noqa: E402
+from server import make_node, to_uri  # noqa: E402
+
+
+def make_link(scheme: str, i: int) -> str:
+    """Build the i-th synthetic share link of a scheme."""
+    host = f"n{i}.bench-{i % 97}.net:{443 + i % 2000}"
+    name = quote(f"bench {scheme} {i}")
+    if scheme == "ss":
+        return to_uri(make_node(4 * i))
+    if scheme == "trojan":
+        return to_uri(make_node(4 * i + 1))
+    if scheme == "vless":
+        return to_uri(make_node(4 * i + 2))
+    if scheme == "vmess":
+        return to_uri(make_node(4 * i + 3))
+    if scheme == "ssr":
+        passwd = base64.urlsafe_b64encode(f"pw{i}".encode()).decode()
+        body = f"1.2.{i // 256 % 256}.{i % 256}:443:origin:aes-256-cfb:plain:{passwd}/?remarks=bmFtZQ&group=Zw"
+        return "ssr://" + base64.urlsafe_b64encode(body.encode()).decode()
+    if scheme == "hysteria2":
+        return f"hysteria2://pw{i}@{host},5000-6000?insecure=1&sni=s{i}.com&obfs=salamander&obfs-password=o{i}#{name}"
+    if scheme == "hysteria":
+        return f"hysteria://{host}?protocol=udp&auth=a{i}&peer=s{i}.com&insecure=1&upmbps=100&downmbps=100&alpn=hysteria#{name}"
+    if scheme == "tuic":
+        return f"tuic://{i:08x}-1111-4222-8333-{i:012x}:pw{i}@{host}?congestion_control=bbr&alpn=h3&sni=s{i}.com#{name}"
+    if scheme == "anytls":
+        return f"anytls://pw{i}@{host}?sni=s{i}.com&fp=chrome&insecure=1#{name}"
+    if scheme == "wireguard":
+        key = quote(base64.b64encode(i.to_bytes(32, "big")).decode(), safe="")
+        return f"wireguard://{key}@{host}?publickey={key}&address=10.0.{i // 256 % 256}.{i % 256}%2F32&mtu=1420#{name}"
+    if scheme == "http":
+        return f"http://{host}?tls=1#{name}"
+    if scheme == "socks5":
+        return f"socks5://u{i}:p{i}@{host}#{name}"
+    raise ValueError(scheme)
+
+
+SCHEMES = ("ss", "ssr", "vmess", "vless", "trojan", "hysteria2", "hysteria", "tuic", "anytls", "wireguard", "http", "socks5")
+
+
+def load_baseline(rev: str) -> types.ModuleType:
+    source = subprocess.run(
+        ["git", "show", f"{rev}:convert.py"], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    module = types.ModuleType("convert_baseline")
+    module.__file__ = os.path.join(ROOT, "convert.py")
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def per_link(func, uris: list[str], repeat: int) -> float:
+    """Best time of converting every link, in microseconds per link."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for uri in uris:
+            func(uri)
+        best = min(best, time.perf_counter() - start)
+    return best / len(uris) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--links", type=int, default=2000, help="links per scheme")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="git revision of convert.py to compare with")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    print(f"{'scheme':<10} {'us/link':>8} {'baseline':>9} {'speedup':>8}")
+    for scheme in SCHEMES:
+        uris = [make_link(scheme, i) for i in range(args.links)]
+        proxies = [convert.v2ray_to_clash(uri) for uri in uris]
+        after = per_link(convert.v2ray_to_clash, uris, args.repeat)
+        row = f"{scheme:<10} {after:>8.1f}"
+        if baseline is not None:
+            try:
+                old = [baseline.v2ray_to_clash(uri) for uri in uris]
+            except baseline.UnsupportedType:
+                old = None
+            if old is not None:
+                assert old == proxies, f"{scheme} links convert differently from {args.baseline}"
+                before = per_link(baseline.v2ray_to_clash, uris, args.repeat)
+                row += f" {before:>9.1f} {before / after:>7.1f}x"
+            else:
+                row += f" {'-':>9} {'-':>8}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
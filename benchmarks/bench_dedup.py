@@ -0,0 +1,92 @@
+"""Benchmark sharded parallel deduplication against merging sources one by one.
+
+Builds ``--sources`` synthetic sources sharing a pool of nodes, with some
+banned names, Google snis, bad ports and repeated names, then deduplicates
+copies of them with :meth:`cli.Deduplicator.add` per source and with
+:meth:`cli.Deduplicator.add_all`, and checks both keep, reject and rename
+exactly the same proxies. The pool is started before timing; set
+``CONF_DEDUP_WORKERS`` to choose its size.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_dedup.py --sources 300 --nodes 1000
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import cli  # noqa: E402
+import dedup  # noqa: E402
+from server import make_node  # noqa: E402
+
+
+def make_sources(count: int, nodes: int, seed: int = 1) -> list:
+    """Sources of up to ``nodes`` proxies, half of them on average duplicates."""
+    rnd = random.Random(seed)
+    shared = [make_node(i) for i in range(count * nodes // 4)]
+    sources = []
+    for s in range(count):
+        source = cli.Source({"url": f"http://bench-{s}.test/sub"})
+        for _ in range(rnd.randint(0, nodes)):
+            proxy = copy.deepcopy(rnd.choice(shared))
+            r = rnd.random()
+            if r < 0.05:
+                proxy["name"] = f"电信 {proxy['name']}"
+            elif r < 0.1:
+                proxy["sni"] = "www.google.com"
+            elif r < 0.12:
+                proxy["port"] = 8
+            elif r < 0.2:
+                proxy["name"] = "unnamed"
+            source.proxies.append(proxy)
+        sources.append(source)
+    return sources
+
+
+def outcome(sources: list) -> list:
+    return [(s.proxies, s.unique_proxies, s.unsupported_proxies) for s in sources]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sources", type=int, default=300)
+    parser.add_argument("--nodes", type=int, default=1000, help="most proxies per source")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    serial = make_sources(args.sources, args.nodes)
+    sharded = copy.deepcopy(serial)
+    total = sum(len(s.proxies) for s in serial)
+    cli.logger.remove()
+
+    if dedup.scan_chunks([[], []]) is None:
+        print("No dedup pool with dedup_workers and the CPU count here, add_all runs serially")
+
+    start = time.perf_counter()
+    dedup_serial = cli.Deduplicator()
+    for source in serial:
+        dedup_serial.add(source)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dedup_sharded = cli.Deduplicator()
+    dedup_sharded.add_all(sharded, args.chunk_size)
+    after = time.perf_counter() - start
+
+    assert outcome(serial) == outcome(sharded), "add_all keeps different proxies than add"
+    assert dedup_serial.names.taken == dedup_sharded.names.taken
+    kept = sum(len(s.unique_proxies) for s in serial)
+    print(f"{total} proxies, {kept} kept")
+    print(f"add per source {before:.2f}s, add_all {after:.2f}s, {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the fake server blocklist lookup of ``is_fake``.
+
+Builds a :class:`hostindex.HostIndex` of ``--entries`` domains and as many
+IPv4 networks, then looks up synthetic proxy servers in it, against the
+``str.endswith`` over every entry that ``is_fake`` used before. The old
+check matches string suffixes, e.g. ``18.8.8.8`` for ``8.8.8.8``, so the
+match counts differ.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_hostindex.py --entries 100000 --servers 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from hostindex import HostIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100000, help="domains, and as many networks")
+    parser.add_argument("--servers", type=int, default=20000)
+    parser.add_argument("--old-servers", type=int, default=200, help="servers timed with str.endswith")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    domains = [f"ads{i}.tracker{i % 977}.example" for i in range(args.entries)]
+    networks = [
+        f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.0/{rng.choice((16, 20, 24))}"
+        for _ in range(args.entries)
+    ]
+    servers = []
+    for i in range(args.servers):
+        if i % 2:
+            servers.append(f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}")
+        elif i % 10 == 0:
+            servers.append(f"cdn.{rng.choice(domains)}")
+        else:
+            servers.append(f"n{i}.proxy{i % 97}.net")
+
+    start = time.perf_counter()
+    index = HostIndex(domains + networks)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = sum(index.match(s) for s in servers)
+    lookup = (time.perf_counter() - start) / len(servers) * 1e6
+
+    suffixes = tuple(domains + [n.split("/")[0] for n in networks])
+    sample = servers[: args.old_servers]
+    start = time.perf_counter()
+    old_matched = sum(s.endswith(suffixes) for s in sample)
+    old_lookup = (time.perf_counter() - start) / len(sample) * 1e6
+
+    print(f"blocklist: {args.entries} domains + {len(index.networks)} networks, built in {build:.2f}s")
+    print(f"{'':<10} {'us/server':>10} {'matched':>10}")
+    print(f"{'endswith':<10} {old_lookup:>10.1f} {old_matched:>5}/{len(sample)}")
+    print(f"{'index':<10} {lookup:>10.2f} {matched:>5}/{len(servers)}")
+    print(f"speedup: {old_lookup / lookup:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the link scanner against the old BeautifulSoup telegram path.
+
+Renders synthetic t.me/s channel pages (see ``server.telegram_body``) of
+growing size and extracts their share links with the old ``from_telegram``
+(six ``find_all`` queries, a regex over every tag's text) and with
+:func:`linkscan.find_links`. Checks both find the same distinct links.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_linkscan.py --links 1000,10000,50000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from urllib.parse import unquote
+
+from bs4 import BeautifulSoup
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from linkscan import find_links  # noqa: E402
+from server import make_node, telegram_body  # noqa: E402
+
+
+def soup_links(content: str) -> list[str]:
+    """The extraction from_telegram did before the link scanner."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    divs = soup.find_all("div", class_="tgme_widget_message_text")
+    divs2 = soup.find_all("div", class_="tgme_widget_message_text js-message_text before_footer")
+    spans = soup.find_all("span", class_="tgme_widget_message_text")
+    codes = soup.find_all("code")
+    span = soup.find_all("span")
+    main_div = soup.find_all("div")
+
+    links = []
+    pattern = r"(vless:\/\/|vmess:\/\/|ss:\/\/|trojan:\/\/|tuic:\/\/|hysteria2:\/\/)(.+?)(?=(?: |\n|\1))"
+    for tag in divs + spans + codes + divs2 + span + main_div:
+        for group in re.findall(pattern, unquote(tag.get_text("\n")), re.MULTILINE):
+            links.append("".join(group))
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--links", default="1000,10000,50000", help="links per page")
+    args = parser.parse_args()
+
+    print(f"{'links':>7} {'MB':>6} {'soup s':>8} {'found':>8} {'scan s':>8} {'found':>7} {'speedup':>8}")
+    for count in (int(n) for n in args.links.split(",")):
+        page = telegram_body([make_node(i) for i in range(count)])
+
+        start = time.perf_counter()
+        old = soup_links(page)
+        soup_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = find_links(page)
+        scan_time = time.perf_counter() - start
+
+        assert set(new) == set(old), "the scanner and the old path disagree"
+        print(
+            f"{count:>7} {len(page) / 2**20:>6.1f} {soup_time:>8.2f} {len(old):>8} "
+            f"{scan_time:>8.3f} {len(new):>7} {soup_time / scan_time:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
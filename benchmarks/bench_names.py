@@ -0,0 +1,82 @@
+"""Stress test unique name allocation with many identically named nodes.
+
+Allocates ``--nodes`` copies of one name, plus names that already carry a
+``#n`` suffix, with :class:`names.NameAllocator`, and checks every result
+is unique and numbered like the probing loop ``unique_name`` used before.
+The probing loop is quadratic, so it is only timed up to ``--probe-max``.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_names.py --nodes 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from names import NameAllocator  # noqa: E402
+
+
+def probe(names: list[str]) -> list[str]:
+    """The name resolution of unique_name before the allocator."""
+    name_set: set[str] = set()
+    out = []
+    for name in names:
+        new_name = name
+        i = 0
+        while new_name in name_set:
+            i += 1
+            new_name = f"{name} #{i}"
+        name_set.add(new_name)
+        out.append(new_name)
+    return out
+
+
+def allocate(names: list[str]) -> list[str]:
+    allocator = NameAllocator()
+    return [allocator.allocate(name) for name in names]
+
+
+def make_names(count: int) -> list[str]:
+    names = ["unnamed"] * count
+    # Names that collide with the numbered variants handed out
+    for i in range(0, count, 10):
+        names[i] = f"unnamed #{i // 3 + 1}"
+    return names
+
+
+def timed(func, names: list[str]) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    result = func(names)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--probe-max", type=int, default=10000, help="largest count timed with probing")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>7} {'probe s':>9} {'allocator s':>12} {'speedup':>8}")
+    counts = [10**k for k in range(3, 9) if 10**k < args.nodes] + [args.nodes]
+    for count in counts:
+        names = make_names(count)
+        alloc_time, allocated = timed(allocate, names)
+        assert len(set(allocated)) == count, "allocated names are not unique"
+        row = f"{count:>7}"
+        if count <= args.probe_max:
+            probe_time, probed = timed(probe, names)
+            assert probed == allocated, "allocator numbers names differently"
+            row += f" {probe_time:>9.3f} {alloc_time:>12.4f} {probe_time / alloc_time:>7.0f}x"
+        else:
+            row += f" {'-':>9} {alloc_time:>12.4f} {'-':>8}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
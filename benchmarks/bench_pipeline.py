@@ -0,0 +1,195 @@
+"""End-to-end pipeline benchmark.
+
+Serves synthetic subscriptions (clash YAML, base64 v2ray and telegram HTML,
+plus the recorded ``results/output/sources/*_fetched.yml`` with
+``--recorded``) from a local HTTP server, points mihomo at
+``fake_mihomo.py`` and drives ``cli.main`` end to end. Each scale runs in
+its own process and reports per-stage time, peak RSS and nodes/sec.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_pipeline.py --scales 10000,100000,500000
+
+Stages overlap in the streaming pipeline, so stage times are the busy time
+spent in each stage and may add up to more than the wall time.
+"""
+
+import argparse
+import asyncio
+import functools
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+STAGES = {
+    "fetch+parse": ("Source", "aparse"),
+    "parse": (None, "parse_proxies"),
+    "dedup": ("Deduplicator", "add_all"),
+    # One mihomo run, reached through check_batch and check_siblings in the
+    # pipeline and through check_nodes in the staged run
+    "delay check": ("ClashDelayChecker", "_check_nodes"),
+    "statistics": (None, "statistics_sources"),
+    "rank": (None, "collect_alive"),
+    "write_sub": (None, "write_sub"),
+}
+
+
+def build_routes(scale: int, sources: int, duplicates: float, recorded: bool) -> dict[str, str]:
+    """Spread ``scale`` synthetic nodes over clash, base64 and telegram sources."""
+    from server import base64_body, clash_body, make_node, telegram_body
+
+    renderers = (clash_body, base64_body, telegram_body)
+    per_source = scale // sources
+    routes = {}
+    for s in range(sources):
+        first = s * per_source
+        # Every source repeats part of the previous one, like real mirrors do
+        repeated = int(per_source * duplicates) if s else 0
+        nodes = [make_node(i) for i in range(first - repeated, first + per_source - repeated)]
+        kind = renderers[s % len(renderers)]
+        routes[f"/{kind.__name__}/{s}"] = kind(nodes)
+    if recorded:
+        for path in sorted(glob.glob(os.path.join(ROOT, "results/output/sources/*_fetched.yml"))):
+            with open(path, "r", encoding="utf-8") as f:
+                routes[f"/recorded/{os.path.basename(path)}"] = f.read()
+    return routes
+
+
+def source_config(path: str, base_url: str) -> dict[str, str]:
+    url = base_url + path
+    if path.startswith("/base64_body/"):
+        return {"url": url, "type": "v2ray", "method": "base64"}
+    if path.startswith("/telegram_body/"):
+        return {"url": url, "type": "v2ray", "method": "telegram"}
+    return {"url": url, "type": "clash"}
+
+
+def instrument(cli, timings: dict[str, float]):
+    """Wrap the stage entry points of cli to accumulate their busy time."""
+    lock = threading.Lock()
+
+    def add(stage: str, elapsed: float):
+        with lock:
+            timings[stage] += elapsed
+
+    for stage, (owner_name, attr) in STAGES.items():
+        owner = getattr(cli, owner_name) if owner_name else cli
+        func = getattr(owner, attr)
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, __func=func, __stage=stage, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await __func(*args, **kwargs)
+                finally:
+                    add(__stage, time.perf_counter() - start)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, __func=func, __stage=stage, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return __func(*args, **kwargs)
+                finally:
+                    add(__stage, time.perf_counter() - start)
+
+        setattr(owner, attr, wrapper)
+
+
+def run_scale(args) -> dict:
+    from server import SubscriptionServer
+
+    routes = build_routes(args.run, args.sources, args.duplicates, args.recorded)
+    output_dir = tempfile.mkdtemp(prefix="bench-")
+    with SubscriptionServer(routes) as server:
+        sources = [source_config(path, server.base_url) for path in routes]
+        os.environ.update(
+            {
+                "CONF_SOURCES": "@json " + json.dumps(sources),
+                "CONF_ISSUE_URL": server.base_url + "/no-issue",
+                "CONF_OUTPUT_DIR": output_dir,
+                "CONF_MIHOMO_BIN": os.path.join(HERE, "fake_mihomo.py"),
+                "CONF_DELAY_BATCH_TEST_SIZE": str(args.batch_size),
+                "CONF_HTTP_CACHE": "false",
+                "CONF_PARSE_CACHE": "false",
+                "CONF_FETCH_MODE": "live",
+                "CONF_PIPELINE_STREAMING": str(not args.staged).lower(),
+            }
+        )
+        # Run in the temp dir, so nothing the run writes to its working
+        # directory (.settings.json, caches) lands in the repository
+        os.symlink(os.path.join(ROOT, "template"), os.path.join(output_dir, "template"))
+        os.chdir(output_dir)
+        sys.path.insert(0, ROOT)
+        from loguru import logger
+
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+        import cli
+
+        timings: dict[str, float] = defaultdict(float)
+        instrument(cli, timings)
+        start = time.perf_counter()
+        cli.main()
+        wall = time.perf_counter() - start
+
+    with open(os.path.join(output_dir, "all_alive.yml"), "r", encoding="utf-8") as f:
+        alive = sum(1 for line in f if line.startswith("- "))
+    return {
+        "scale": args.run,
+        "wall": wall,
+        "stages": dict(timings),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "nodes_per_sec": args.run / wall,
+        "alive": alive,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default="10000,100000,500000")
+    parser.add_argument("--sources", type=int, default=24, help="synthetic sources per run")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share repeated from the previous source")
+    parser.add_argument("--batch-size", type=int, default=5000, help="nodes per mihomo process")
+    parser.add_argument("--recorded", action="store_true", help="also serve the recorded sources")
+    parser.add_argument("--staged", action="store_true", help="use the stage-by-stage run instead of the pipeline")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scale(args)))
+        return
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(",")):
+        cmd = [sys.executable, __file__, "--run", str(scale)] + sys.argv[1:]
+        out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    header = f"{'nodes':>8} {'wall s':>8} {'nodes/s':>9} {'RSS MB':>8} {'alive':>7}  " + " ".join(
+        f"{stage:>12}" for stage in STAGES
+    )
+    print(header)
+    for r in results:
+        stages = " ".join(f"{r['stages'].get(stage, 0.0):>12.2f}" for stage in STAGES)
+        print(
+            f"{r['scale']:>8} {r['wall']:>8.2f} {r['nodes_per_sec']:>9.0f} "
+            f"{r['peak_rss_mb']:>8.0f} {r['alive']:>7}  {stages}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark the line parser of clash proxy lists against a full YAML load.
+
+Parses the recorded ``results/output/sources/*_fetched.yml`` bodies, which
+are written block style, and the same proxies rendered as one flow mapping
+per line the way most remote clash sources serve them, followed by a
+``proxy-groups:`` and ``rules:`` section. Results are checked to match.
+The YAML load goes through :mod:`yamlio`, i.e. LibYAML when PyYAML has it.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_proxylist.py
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import yamlio  # noqa: E402
+from proxylist import ProxyListParser  # noqa: E402
+
+
+def yaml_proxies(content: str) -> list:
+    config = yamlio.load(content)
+    proxies = []
+    for p in config["proxies"]:
+        if "password" in p and not isinstance(p["password"], str):
+            p["password"] = str(p["password"])
+        proxies.append(p)
+    return proxies
+
+
+def line_proxies(content: str) -> tuple[list, ProxyListParser]:
+    parser = ProxyListParser()
+    proxies = parser.feed(content.splitlines())
+    proxies.extend(parser.close())
+    return proxies, parser
+
+
+def flow_body(proxies: list, groups: int) -> str:
+    lines = ["port: 7890", "proxies:"]
+    for p in proxies:
+        lines.append("  - " + yaml.dump(p, default_flow_style=True, allow_unicode=True, width=10**9).strip())
+    # Groups and rules are often as long as the proxy list itself
+    lines.append("proxy-groups:")
+    names = ", ".join(f"'{p['name']}'" for p in proxies[:200])
+    for i in range(groups):
+        lines.append(f"  - {{name: G{i}, type: url-test, proxies: [{names}]}}")
+    lines.append("rules:")
+    lines.extend(f"  - DOMAIN-SUFFIX,site{i}.example,G{i % max(groups, 1)}" for i in range(len(proxies)))
+    return "\n".join(lines) + "\n"
+
+
+def timed(func, content: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--groups", type=int, default=10, help="proxy groups in the flow bodies")
+    args = parser.parse_args()
+
+    block, flow = [], []
+    for path in sorted(glob.glob(os.path.join(ROOT, "results/output/sources/*_fetched.yml"))):
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        proxies = yaml_proxies(content)
+        if not proxies:
+            continue
+        block.append(content)
+        flow.append(flow_body(proxies, args.groups))
+    if not block:
+        sys.exit("No recorded sources under results/output/sources")
+
+    print(f"{'bodies':<8} {'proxies':>8} {'MB':>6} {'yaml s':>8} {'lines s':>8} {'speedup':>8} {'fast %':>7}")
+    for label, bodies in (("block", block), ("flow", flow)):
+        total_yaml = total_lines = 0.0
+        count = fast = size = 0
+        for content in bodies:
+            expected = yaml_proxies(content)
+            got, stats = line_proxies(content)
+            assert got == expected, "line parser disagrees with the YAML loader"
+            count += len(got)
+            fast += stats.fast
+            size += len(content.encode("utf-8"))
+            total_yaml += timed(yaml_proxies, content, args.repeat)
+            total_lines += timed(line_proxies, content, args.repeat)
+        print(
+            f"{label:<8} {count:>8} {size / 2**20:>6.1f} {total_yaml:>8.2f} {total_lines:>8.2f} "
+            f"{total_yaml / total_lines:>7.1f}x {100 * fast / max(count, 1):>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark the per-node settings lookups against the compiled snapshot.
+
+Times a bare Dynaconf attribute read against a snapshot attribute read, then
+the per-node helpers of ``cli.py`` (``is_fake``, ``Deduplicator.unique_name``,
+``clash_data`` and the region categorization of ``write_sub``) on synthetic
+nodes, against the same logic reading ``settings`` for every node, as
+``cli.py`` did before the snapshot. Results are checked to be the same.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_settings.py --nodes 20000
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+from itertools import chain
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import cli  # noqa: E402
+from config import get_snapshot, settings  # noqa: E402
+from server import make_node  # noqa: E402
+from utils import b64decodes  # noqa: E402
+
+
+def settings_is_fake(proxy: dict) -> bool:
+    """is_fake reading ``settings``, with the blocklist as string suffixes."""
+    return any(
+        [proxy["server"].endswith(_) for _ in chain(settings.fake_domains, settings.fake_ips)]
+    ) or any(k in proxy["name"] for k in settings.ban)
+
+
+def settings_names(nodes: list) -> list[str]:
+    """unique_name reading ``settings``."""
+    name_set: set[str] = set()
+    for data in nodes:
+        for word in [w for ws in settings.banned_words for w in b64decodes(ws).split()]:
+            data["name"] = str(data["name"]).replace(word, "*" * len(word))
+        if len(data["name"]) > 30:
+            data["name"] = data["name"][:30] + "..."
+        for disp, disp_name in settings.region_names.items():
+            if data["name"] == disp_name:
+                data["name"] = disp
+        i, new_name = 0, data["name"]
+        while new_name in name_set:
+            i += 1
+            new_name = f"{data['name']} #{i}"
+        data["name"] = new_name
+        name_set.add(new_name)
+    return [n["name"] for n in nodes]
+
+
+def settings_clash_data(proxy: dict) -> dict:
+    """The uuid check of clash_data reading ``settings``."""
+    ret = proxy.copy()
+    if "uuid" in ret and len(ret["uuid"]) != len(settings.default_uuid):
+        ret["uuid"] = settings.default_uuid
+    return ret
+
+
+def settings_regions(name: str) -> list[str]:
+    """The categorization loop write_sub ran over ``settings.region_map``."""
+    possible_regions = []
+    for k, region_keys in settings.region_map.items():
+        for region_key in region_keys:
+            if region_key in name:
+                possible_regions.append(k)
+                break
+        if possible_regions and region_keys[-1] == "OVERALL":
+            break
+    return possible_regions
+
+
+def snapshot_names(nodes: list) -> list[str]:
+    dedup = cli.Deduplicator()
+    for node in nodes:
+        dedup.unique_name(node)
+    return [n["name"] for n in nodes]
+
+
+def snapshot_clash_data(proxy: dict) -> dict:
+    ret = proxy.copy()
+    default_uuid = get_snapshot().default_uuid
+    if "uuid" in ret and len(ret["uuid"]) != len(default_uuid):
+        ret["uuid"] = default_uuid
+    return ret
+
+
+def timed(func, nodes, repeat: int, copies: bool = False):
+    """Best time per node in microseconds, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        batch = copy.deepcopy(nodes) if copies else nodes
+        start = time.perf_counter()
+        result = func(batch)
+        best = min(best, time.perf_counter() - start)
+    return best / len(nodes) * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = get_snapshot()
+    nodes = [make_node(i) for i in range(args.nodes)]
+    for node in nodes[::50]:
+        node["name"] = f"电信 {node['name']} 中转"  # Some banned and relay names
+
+    print(f"{'lookup':<16} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    rows = [
+        ("attribute read",
+         timed(lambda ns: [settings.fake_domains for _ in ns], nodes, args.repeat),
+         timed(lambda ns: [snapshot.fake_servers for _ in ns], nodes, args.repeat)),
+        ("is_fake",
+         timed(lambda ns: [settings_is_fake(n) for n in ns], nodes, args.repeat),
+         timed(lambda ns: [cli.is_fake(n) for n in ns], nodes, args.repeat)),
+        ("unique_name",
+         timed(settings_names, nodes, args.repeat, copies=True),
+         timed(snapshot_names, nodes, args.repeat, copies=True)),
+        ("clash_data",
+         timed(lambda ns: [settings_clash_data(n) for n in ns], nodes, args.repeat),
+         timed(lambda ns: [snapshot_clash_data(n) for n in ns], nodes, args.repeat)),
+        ("region",
+         timed(lambda ns: [settings_regions(n["name"]) for n in ns], nodes, args.repeat),
+         timed(lambda ns: [cli.node_regions(n["name"]) for n in ns], nodes, args.repeat)),
+    ]
+    for label, (before, old), (after, new) in rows:
+        if label != "attribute read":
+            assert old == new, f"{label} gives different results with the snapshot"
+        print(f"{label:<16} {before:>10.2f} {after:>9.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark yamlio against the pure-Python PyYAML calls it replaced.
+
+Loads and dumps ``results/output/all.yml`` (or ``--file``) the old way,
+``yaml.full_load`` after replacing ``!<str>`` and ``yaml.dump``, and
+through :mod:`yamlio`, checking that both give the same data.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_yamlio.py
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import yamlio  # noqa: E402
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--file", default=os.path.join(ROOT, "results/output/all.yml"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        content = f.read()
+    old = yaml.full_load(content.replace("!<str> ", ""))
+    new = yamlio.load(content)
+    assert old == new, "yamlio loads different data"
+    # LibYAML quotes some scalars PyYAML leaves plain, so compare what reads back
+    assert yamlio.load(yamlio.dump(new)) == old, "yamlio dumps different data"
+
+    def stream_load():
+        with open(args.file, "r", encoding="utf-8") as f:
+            yamlio.load(f)
+
+    rows = [
+        ("load", best_of(args.repeat, lambda: yaml.full_load(content.replace("!<str> ", ""))),
+         best_of(args.repeat, yamlio.load, content)),
+        ("load file", best_of(args.repeat, lambda: yaml.full_load(open(args.file, encoding="utf-8"))),
+         best_of(args.repeat, stream_load)),
+        ("dump", best_of(args.repeat, lambda: yaml.dump(old, io.StringIO(), allow_unicode=True)),
+         best_of(args.repeat, lambda: yamlio.dump(new, io.StringIO()))),
+    ]
+    print(f"{os.path.basename(args.file)}: {len(content.encode('utf-8')) / 2**20:.1f} MB, "
+          f"{len(new.get('proxies') or [])} proxies, LibYAML: {yamlio.LIBYAML}")
+    print(f"{'':<10} {'PyYAML s':>9} {'yamlio s':>9} {'speedup':>8}")
+    for label, before, after in rows:
+        print(f"{label:<10} {before:>9.3f} {after:>9.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
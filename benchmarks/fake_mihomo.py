@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Stand-in for the mihomo binary used by the benchmarks.
+
+Accepts ``-f <config>`` like mihomo, serves the external-controller endpoints
+ClashDelayChecker talks to (``/version``, ``/group/<name>/delay``,
+``/proxies`` and ``/proxies/<name>/delay``) and answers delay tests
+instantly. Whether a proxy is alive and its delay derive from a checksum of
+its name, so results are stable across runs.
+
+Environment:
+    FAKE_MIHOMO_DEAD: Percentage of dead proxies, 40 by default
+    FAKE_MIHOMO_LATENCY: Seconds to sleep per delay request, 0 by default
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import yaml
+
+DEAD_PERCENT = int(os.environ.get("FAKE_MIHOMO_DEAD", "40"))
+LATENCY = float(os.environ.get("FAKE_MIHOMO_LATENCY", "0"))
+
+
+def probe(name: str) -> int:
+    """Get the delay of a proxy, 0 if it is dead."""
+    crc = zlib.crc32(name.encode("utf-8"))
+    if crc % 100 < DEAD_PERCENT:
+        return 0
+    return 50 + crc % 950
+
+
+class Controller:
+    def __init__(self, config: dict):
+        self.proxies = [p["name"] for p in config.get("proxies", [])]
+        self.groups = {g["name"]: g.get("proxies", []) for g in config.get("proxy-groups", [])}
+        self.history: dict[str, list[dict]] = {}
+
+    def test(self, names: list[str]) -> dict[str, int]:
+        if LATENCY:
+            time.sleep(LATENCY)
+        now = datetime.now(timezone.utc).isoformat()
+        delays = {}
+        for name in names:
+            delays[name] = probe(name)
+            self.history.setdefault(name, []).append({"time": now, "delay": delays[name]})
+        return {k: v for k, v in delays.items() if v}
+
+    def snapshot(self) -> dict:
+        proxies = {}
+        for name in self.proxies:
+            history = self.history.get(name, [])
+            proxies[name] = {
+                "alive": bool(history and history[-1]["delay"]),
+                "history": history,
+                "name": name,
+                "type": "Shadowsocks",
+            }
+        for name, members in self.groups.items():
+            proxies[name] = {"alive": True, "history": [], "name": name, "type": "Selector"}
+        return {"proxies": proxies}
+
+
+def make_handler(controller: Controller):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parts = [unquote(p) for p in urlsplit(self.path).path.split("/") if p]
+            if parts == ["version"]:
+                self.reply(200, {"version": "fake-mihomo", "meta": True})
+            elif parts == ["proxies"]:
+                self.reply(200, controller.snapshot())
+            elif len(parts) == 3 and parts[0] == "group" and parts[2] == "delay":
+                if parts[1] not in controller.groups:
+                    self.reply(404, {"message": "group not found"})
+                else:
+                    self.reply(200, controller.test(controller.groups[parts[1]]))
+            elif len(parts) == 3 and parts[0] == "proxies" and parts[2] == "delay":
+                delay = controller.test([parts[1]]).get(parts[1], 0)
+                if delay:
+                    self.reply(200, {"delay": delay})
+                else:
+                    self.reply(504, {"message": "Timeout"})
+            else:
+                self.reply(404, {"message": "not found"})
+
+        def do_PUT(self):
+            self.send_response(204)
+            self.end_headers()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", dest="config", required=True)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+    host, port = config["external-controller"].rsplit(":", 1)
+    server = ThreadingHTTPServer((host, int(port)), make_handler(Controller(config)))
+    print(f"fake mihomo serving {len(config.get('proxies', []))} proxies on {host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Local HTTP stand-in for subscription sources, plus synthetic bodies."""
+
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import quote
+
+import yaml
+
+CIPHERS = ("aes-128-gcm", "aes-256-gcm", "chacha20-ietf-poly1305")
+REGIONS = ("🇺🇸 US", "🇯🇵 JP", "🇭🇰 HK", "🇸🇬 SG", "🇩🇪 DE", "Relay")
+
+
+def make_node(i: int) -> dict[str, Any]:
+    """Build the i-th synthetic clash proxy, cycling through protocols."""
+    name = f"{REGIONS[i % len(REGIONS)]} {i}"
+    server = f"n{i}.bench-{i % 97}.net"
+    port = 443 + i % 2000
+    uuid = f"{i:08x}-1111-4222-8333-{i:012x}"
+    kind = i % 4
+    if kind == 0:
+        return {
+            "name": name,
+            "server": server,
+            "port": port,
+            "type": "ss",
+            "cipher": CIPHERS[i % len(CIPHERS)],
+            "password": f"pw{i}",
+        }
+    if kind == 1:
+        return {
+            "name": name,
+            "server": server,
+            "port": port,
+            "type": "trojan",
+            "password": f"pw{i}",
+            "sni": server,
+            "skip-cert-verify": True,
+        }
+    if kind == 2:
+        return {
+            "name": name,
+            "server": server,
+            "port": port,
+            "type": "vless",
+            "uuid": uuid,
+            "tls": True,
+            "network": "ws",
+            "servername": server,
+            "ws-opts": {"path": f"/ws{i % 13}", "headers": {"Host": server}},
+        }
+    return {
+        "name": name,
+        "server": server,
+        "port": port,
+        "type": "vmess",
+        "uuid": uuid,
+        "alterId": 0,
+        "cipher": "auto",
+        "tls": False,
+        "network": "ws",
+        "ws-opts": {"path": f"/vm{i % 7}", "headers": {"Host": server}},
+    }
+
+
+def to_uri(node: dict[str, Any]) -> str:
+    """Encode a synthetic proxy from :func:`make_node` as a share link."""
+    name = quote(node["name"])
+    host = f"{node['server']}:{node['port']}"
+    if node["type"] == "ss":
+        userinfo = base64.urlsafe_b64encode(
+            f"{node['cipher']}:{node['password']}".encode()
+        ).decode()
+        return f"ss://{userinfo}@{host}#{name}"
+    if node["type"] == "trojan":
+        return f"trojan://{node['password']}@{host}?sni={node['sni']}&allowInsecure=1#{name}"
+    if node["type"] == "vless":
+        opts = node["ws-opts"]
+        return (
+            f"vless://{node['uuid']}@{host}?type=ws&security=tls&sni={node['servername']}"
+            f"&host={opts['headers']['Host']}&path={quote(opts['path'], safe='')}#{name}"
+        )
+    vmess = {
+        "v": "2",
+        "ps": node["name"],
+        "add": node["server"],
+        "port": node["port"],
+        "id": node["uuid"],
+        "aid": 0,
+        "scy": "auto",
+        "net": "ws",
+        "type": "none",
+        "host": node["ws-opts"]["headers"]["Host"],
+        "path": node["ws-opts"]["path"],
+        "tls": "",
+    }
+    return "vmess://" + base64.b64encode(json.dumps(vmess).encode()).decode()
+
+
+def clash_body(nodes: list[dict[str, Any]]) -> str:
+    """Render proxies as a clash config with one flow mapping per line."""
+    lines = ["port: 7890", "mode: rule", "proxies:"]
+    for node in nodes:
+        flow = yaml.dump(node, default_flow_style=True, allow_unicode=True, sort_keys=False, width=10**9)
+        lines.append(f"  - {flow.strip()}")
+    lines += ["proxy-groups:", "  - {name: PROXY, type: select, proxies: [DIRECT]}", "rules:", "  - MATCH,PROXY"]
+    return "\n".join(lines) + "\n"
+
+
+def base64_body(nodes: list[dict[str, Any]]) -> str:
+    """Render proxies as a base64 v2ray subscription."""
+    return base64.b64encode("\n".join(to_uri(n) for n in nodes).encode()).decode()
+
+
+def telegram_body(nodes: list[dict[str, Any]], per_message: int = 5) -> str:
+    """Render proxies as a t.me/s channel page, a few links per message."""
+    messages = []
+    for i in range(0, len(nodes), per_message):
+        links = "<br/>".join(
+            f"<code>{to_uri(n).replace('&', '&amp;')}</code>" for n in nodes[i : i + per_message]
+        )
+        messages.append(
+            '<div class="tgme_widget_message_wrap"><div class="tgme_widget_message">'
+            f'<div class="tgme_widget_message_text js-message_text" dir="auto">Free nodes:<br/>{links}</div>'
+            '<span class="tgme_widget_message_views">1.2K</span></div></div>'
+        )
+    return "<html><body><section>" + "".join(messages) + "</section></body></html>"
+
+
+class SubscriptionServer:
+    """Serve fixed bodies from a background thread on 127.0.0.1."""
+
+    def __init__(self, routes: dict[str, str]):
+        self.routes = {path: body.encode("utf-8") for path, body in routes.items()}
+        routes_ = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                body = routes_.get(self.path.split("?")[0])
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,4 +1,3 @@
-import base64
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from copy import deepcopy
 import subprocess
@@ -6,9 +5,8 @@ import tempfile
 import threading
 import time
 import urllib.parse
-import json
 import re
-import yaml
+import yamlio
 import httpx
 import asyncio
 from typing import Any, Optional
@@ -19,9 +17,12 @@ import platform
 import os
 from datetime import datetime
 
+from delaycache import get_delay_cache
+from endpoints import EndpointIndex
 from model import ProxyDelayList, ProxyDelayItem, average_delay
+from nodestore import get_node_store
 from ports import PortPool
-from utils import b64decodes_safe, extra_headers
+from utils import extra_headers
 from config import settings
 from loguru import logger
 from requests_html import HTMLSession
@@ -1197,181 +1198,6 @@ clash_config_template = {
 }
 
 
-# 解析 Hysteria2 链接
-def parse_hysteria2_link(link):
-    link = link[14:]
-    parts = link.split("@")
-    uuid = parts[0]
-    server_info = parts[1].split("?")
-    server = server_info[0].split(":")[0]
-    port = int(server_info[0].split(":")[1].split("/")[0].strip())
-    query_params = urllib.parse.parse_qs(server_info[1] if len(server_info) > 1 else "")
-    insecure = "1" in query_params.get("insecure", ["0"])
-    sni = query_params.get("sni", [""])[0]
-    name = urllib.parse.unquote(link.split("#")[-1].strip())
-
-    return {
-        "name": f"{name}",
-        "server": server,
-        "port": port,
-        "type": "hysteria2",
-        "password": uuid,
-        "auth": uuid,
-        "sni": sni,
-        "skip-cert-verify": not insecure,
-        "client-fingerprint": "chrome",
-    }
-
-
-# 解析 Shadowsocks 链接
-def parse_ss_link(link: str):
-    uri = link[5:]
-    if "#" in uri:
-        config_part, name = uri.split("#")
-    else:
-        config_part, name = uri, ""
-    decoded = base64.urlsafe_b64decode(
-        config_part.split("@")[0] + "=" * (-len(config_part.split("@")[0]) % 4)
-    ).decode("utf-8")
-    method_passwd = (
-        decoded.split(":") if "@" in config_part else decoded.split("@")[0].split(":")
-    )
-    cipher, password = (
-        method_passwd if len(method_passwd) == 2 else (method_passwd[0], "")
-    )
-    if "@" in config_part:
-        server_info = config_part.split("@")[1]
-    else:
-        server_info = b64decodes_safe(config_part).split("@")[1]
-    if "?" in server_info:
-        server_info = server_info.split("?")[0]
-    server, port = server_info.split(":") if ":" in server_info else (server_info, "")
-    if port.endswith("/"):
-        port = port[:-1]
-
-    return {
-        "name": urllib.parse.unquote(name),
-        "type": "ss",
-        "server": server,
-        "port": int(port),
-        "cipher": cipher,
-        "password": password,
-        "udp": False,
-    }
-
-
-# 解析 Trojan 链接
-def parse_trojan_link(link):
-    link = link[9:]
-    config_part, name = link.split("#")
-    user_info, host_info = config_part.split("@")
-    username, password = user_info.split(":") if ":" in user_info else ("", user_info)
-    host, port_and_query = host_info.split(":") if ":" in host_info else (host_info, "")
-    port, query = (
-        port_and_query.split("?", 1) if "?" in port_and_query else (port_and_query, "")
-    )
-
-    return {
-        "name": urllib.parse.unquote(name),
-        "type": "trojan",
-        "server": host,
-        "port": int(port),
-        "password": password,
-        "sni": urllib.parse.parse_qs(query).get("sni", [""])[0],
-        "skip-cert-verify": urllib.parse.parse_qs(query).get(
-            "skip-cert-verify", ["false"]
-        )[0]
-        == "true",
-    }
-
-
-# 解析 VLESS 链接
-def parse_vless_link(link):
-    link = link[8:]
-    links = link.split("#")
-    config_part, name = links if len(links) == 2 else ("".join(links[:-1]), links[-1])
-    parts = config_part.split("@")
-    user_info, host_info = parts if len(parts) == 2 else (parts[0], "".join(parts[1:]))
-    uuid = user_info
-    host, query = host_info.split("?", 1) if "?" in host_info else (host_info, "")
-    port = host.split(":")[-1] if ":" in host else ""
-    host = host.split(":")[0] if ":" in host else ""
-
-    return {
-        "name": urllib.parse.unquote(name),
-        "type": "vless",
-        "server": host,
-        "port": int(port),
-        "uuid": uuid,
-        "security": urllib.parse.parse_qs(query).get("security", ["none"])[0],
-        "tls": urllib.parse.parse_qs(query).get("security", ["none"])[0] == "tls",
-        "sni": urllib.parse.parse_qs(query).get("sni", [""])[0],
-        "skip-cert-verify": urllib.parse.parse_qs(query).get(
-            "skip-cert-verify", ["false"]
-        )[0]
-        == "true",
-        "network": urllib.parse.parse_qs(query).get("type", ["tcp"])[0],
-        "ws-opts": (
-            {
-                "path": urllib.parse.parse_qs(query).get("path", [""])[0],
-                "headers": {"Host": urllib.parse.parse_qs(query).get("host", [""])[0]},
-            }
-            if urllib.parse.parse_qs(query).get("type", ["tcp"])[0] == "ws"
-            else {}
-        ),
-    }
-
-
-# 解析 VMESS 链接
-def parse_vmess_link(link):
-    link = link[8:]
-    decoded_link = base64.urlsafe_b64decode(link + "=" * (-len(link) % 4)).decode(
-        "utf-8"
-    )
-    vmess_info = json.loads(decoded_link)
-
-    return {
-        "name": urllib.parse.unquote(vmess_info.get("ps", "vmess")),
-        "type": "vmess",
-        "server": vmess_info["add"],
-        "port": int(vmess_info["port"]),
-        "uuid": vmess_info["id"],
-        "alterId": int(vmess_info.get("aid", 0)),
-        "cipher": "auto",
-        "network": vmess_info.get("net", "tcp"),
-        "tls": vmess_info.get("tls", "") == "tls",
-        "sni": vmess_info.get("sni", ""),
-        "ws-opts": (
-            {
-                "path": vmess_info.get("path", ""),
-                "headers": {"Host": vmess_info.get("host", "")},
-            }
-            if vmess_info.get("net", "tcp") == "ws"
-            else {}
-        ),
-    }
-
-
-def parse_md_link(link):
-    """parse nodes from md url link"""
-    try:
-        # 发送请求并获取内容
-        response = requests.get(link)
-        response.raise_for_status()  # 检查请求是否成功
-        content = response.text
-        content = urllib.parse.unquote(content)
-        # 定义正则表达式模式，匹配所需的协议链接
-        pattern = r"(?:vless|vmess|trojan|hysteria2|ss):\/\/[^#\s]*(?:#[^\s]*)?"
-
-        # 使用re.findall()提取所有匹配的链接
-        matches = re.findall(pattern, content)
-        return matches
-
-    except requests.RequestException as e:
-        logger.info(f"请求错误: {e}")
-        return []
-
-
 # js渲染页面
 def js_render(url):
     timeout = 4
@@ -1409,44 +1235,14 @@ def match_nodes(text):
     # 将每个节点字符串转换为字典
     proxies_list = []
     for node in nodes:
-        # 使用yaml.safe_load来加载每个节点
-        node_dict = yaml.safe_load(node)
+        # 使用yamlio.load来加载每个节点
+        node_dict = yamlio.load(node)
         proxies_list.append(node_dict)
 
     yaml_data = {"proxies": proxies_list}
     return yaml_data
 
 
-# 解析不同的代理链接
-def parse_proxy_link(link):
-    if link.startswith("hysteria2://") or link.startswith("hy2://"):
-        return parse_hysteria2_link(link)
-    elif link.startswith("trojan://"):
-        return parse_trojan_link(link)
-    elif link.startswith("ss://"):
-        return parse_ss_link(link)
-    elif link.startswith("vless://"):
-        return parse_vless_link(link)
-    elif link.startswith("vmess://"):
-        return parse_vmess_link(link)
-    return None
-
-
-def handle_links(new_links, resolve_name_conflicts):
-    try:
-        for new_link in new_links:
-            if new_link.startswith(
-                ("hysteria2://", "hy2://", "trojan://", "ss://", "vless://", "vmess://")
-            ):
-                node = parse_proxy_link(new_link)
-                if node:
-                    resolve_name_conflicts(node)
-            else:
-                logger.info(f"跳过无效或不支持的链接: {new_link}")
-    except Exception:
-        pass
-
-
 def generate_clash_config(nodes: list[dict[str, Any]]) -> dict[str, Any]:
     now = datetime.now()
     logger.info(f"当前时间: {now}")
@@ -1562,7 +1358,7 @@ class ClashConfigHelper:
         """保存配置到文件"""
         try:
             with open(config_file, "w", encoding="utf-8") as f:
-                yaml.dump(self.config, f, allow_unicode=True, sort_keys=False)
+                yamlio.dump(self.config, f, sort_keys=False)
             logger.info(f"新配置已保存到: {config_file}")
         except Exception as e:
             logger.info(f"保存配置文件失败: {e}")
@@ -1622,8 +1418,8 @@ def prepare_clash():
     # 确定下载链接和新名称
     new_name = f"mihomo-{os_type}"
 
-    # 检查是否已存在二进制文件
-    if os.path.exists(new_name):
+    # 检查是否已存在二进制文件，或已指定 mihomo 可执行文件
+    if settings.mihomo_bin or os.path.exists(new_name):
         return
 
     url = f"https://api.github.com/repos/MetaCubeX/mihomo/releases/tags/{settings.mihomo_version}"
@@ -1736,7 +1532,7 @@ class ClashProcess:
 
     def start(self):
         logger.info("===================启动clash并初始化配置===================")
-        clash_bin = f"./mihomo-{platform.system().lower()}"
+        clash_bin = settings.mihomo_bin or f"./mihomo-{platform.system().lower()}"
         not_started = True
         while not_started:
             with tempfile.TemporaryDirectory() as temp_dir:
@@ -2074,11 +1870,11 @@ class ClashDelayChecker:
 
     def __init__(self) -> None:
         self._lock = threading.Lock()
-        self._async_lock = asyncio.Lock()
         self.port_pool = PortPool()
         self.proxy_delay_dict: dict[str, ProxyDelayItem] = {}
         self.problem_proxies: list[dict[str, Any]] = []
         self.nodes: list[dict[str, Any]] = []
+        self.cached_names: set[str] = set()
 
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls)
@@ -2087,8 +1883,40 @@ class ClashDelayChecker:
             cls._prepared = True
         return instance
 
-    def check_nodes(self, nodes: list[dict[str, Any]]):
-        self.nodes.extend(nodes)
+    def check_nodes(self, nodes: list[dict[str, Any]], endpoints: Optional[EndpointIndex] = None):
+        """检测节点；给出 endpoints 时只先测各端点的代表节点，再测存活代表的同端点节点"""
+        if endpoints is None:
+            self._check_in_batches(nodes)
+            return
+        representatives = endpoints.representatives()
+        logger.info(f"先检测 {len(representatives)}/{len(nodes)} 个端点代表节点")
+        self._check_in_batches(representatives)
+        self.check_siblings(endpoints)
+
+    def check_siblings(self, endpoints: EndpointIndex):
+        """检测代表节点存活的端点上的其余节点"""
+        siblings = endpoints.siblings(self._alive_delay_results())
+        logger.info(f"再检测 {len(siblings)} 个存活端点的同端点节点")
+        self._check_in_batches(siblings)
+
+    def _skip_cached(self, nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """取出延迟缓存中近期的检测结果，返回仍需送去 mihomo 检测的节点"""
+        cache = get_delay_cache()
+        if cache is None:
+            return nodes
+        cached, missing = cache.lookup(nodes)
+        with self._lock:
+            self.nodes.extend(n for n in nodes if n["name"] in cached)
+            self.proxy_delay_dict.update(cached)
+            self.cached_names.update(cached)
+        if cached:
+            logger.info(f"延迟缓存命中 {len(cached)}/{len(nodes)} 个节点，跳过检测")
+        return missing
+
+    def _check_in_batches(self, nodes: list[dict[str, Any]]):
+        nodes = self._skip_cached(nodes)
+        with self._lock:
+            self.nodes.extend(nodes)
         for i in range(0, len(nodes), settings.delay_batch_test_size):
             batch_nodes = nodes[i : i + settings.delay_batch_test_size]
             batch_msg = f"{len(batch_nodes)}/{len(batch_nodes)+i}/{len(nodes)}"
@@ -2096,6 +1924,17 @@ class ClashDelayChecker:
             self._check_nodes(batch_nodes)
             logger.info(f"batched finished: {batch_msg}")
 
+    def check_batch(self, nodes: list[dict[str, Any]]):
+        """检测一批节点，供流水线在节点陆续到达时调用，可在多个线程中并发执行"""
+        nodes = self._skip_cached(nodes)
+        if not nodes:
+            return
+        with self._lock:
+            self.nodes.extend(nodes)
+        logger.info(f"batched nodes: {len(nodes)}")
+        self._check_nodes(nodes)
+        logger.info(f"batched finished: {len(nodes)}")
+
     def _check_nodes(self, nodes: list[dict[str, Any]]):
         ports = [self.port_pool.get_port() for _ in range(4)]
         try:
@@ -2140,21 +1979,37 @@ class ClashDelayChecker:
             ]
         }
 
-    def get_nodes(self):
+    def _alive_delay_results(self) -> dict[str, ProxyDelayItem]:
         alive_delay_results = {}
-        for k, d in self.proxy_delay_dict.items():
+        with self._lock:
+            delay_items = list(self.proxy_delay_dict.items())
+        for k, d in delay_items:
             if d.alive:
                 if d.history is None or len(d.history) == 0:
                     logger.info(f"节点 {k} 延迟数据为空")
                     continue
                 alive_delay_results[k] = d
+        return alive_delay_results
+
+    def get_nodes(self):
+        alive_delay_results = self._alive_delay_results()
 
         delay_nodes = [n for n in self.nodes if n["name"] in alive_delay_results]
-        delay_nodes.sort(
-            key=lambda n: average_delay(
-                self.proxy_delay_dict[n["name"]].history,
+        delays = {
+            n["name"]: average_delay(alive_delay_results[n["name"]].history) for n in delay_nodes
+        }
+        delay_nodes.sort(key=lambda n: delays[n["name"]])
+
+        # 缓存的结果已与本次结果合并排序；只记录本次实际检测过的节点，未存活的延迟记为 None
+        tested = [n for n in self.nodes if n["name"] not in self.cached_names]
+        if (store := get_node_store()) is not None:
+            store.record_delays((n, delays.get(n["name"])) for n in tested)
+        if (cache := get_delay_cache()) is not None:
+            cache.put(
+                (n, self.proxy_delay_dict[n["name"]])
+                for n in tested
+                if n["name"] in self.proxy_delay_dict
             )
-        )
         return delay_nodes
 
     async def nodes_clean(self, config_helper: ClashConfigHelper) -> None:
@@ -2235,8 +2090,9 @@ class ClashDelayChecker:
     async def sync_delays(self, clash_api: ClashAPI, group_name: str):
         try:
             clash_proxies = await clash_api.get_proxies()
-            async with self._async_lock:
-                delays = ProxyDelayList.model_validate(clash_proxies)
+            delays = ProxyDelayList.model_validate(clash_proxies)
+            # 不同批次运行在各自线程的事件循环中，使用线程锁
+            with self._lock:
                 self.proxy_delay_dict.update(delays.proxies)
         except Exception as e:
             logger.exception(f"获取策略组 {group_name} 节点延迟失败: {e}")
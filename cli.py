@@ -1,29 +1,44 @@
-from itertools import chain
+import asyncio
+import contextlib
 import json
 import os
-import pathlib
 import re
 import time
-import yaml
+import yamlio
 from typing import Union, Any, Optional
-import requests
 import datetime
 import copy
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import unquote
+from concurrent.futures import Executor, ThreadPoolExecutor
 from clash import ClashDelayChecker
-from convert import v2ray_to_clash
+from convcache import get_convert_cache
+from convert import BatchResult, v2ray_to_clash_batch
+from delaycache import get_delay_cache
+from dedup import SeenSet, is_fake, scan_chunks
+from endpoints import EndpointIndex, EndpointRole
+from fetcher import get_engine
+from fingerprint import fingerprint
+from health import CircuitState, get_health_registry
+from linkscan import find_links
 from model import average_delay
-from utils import b64decodes, extra_headers, read_yaml
+from names import NameAllocator, NameNormalizer
+from nodestore import get_node_store
+from parsecache import get_parse_cache
+from proxylist import ProxyListParser, load_proxies
+from utils import b64decodes, read_yaml
 from bs4 import BeautifulSoup
 
 from loguru import logger
-from config import settings
+from config import get_snapshot, settings
 from dynaconf.utils.boxing import DynaBox
 
+STREAM_BATCH_LINES = 1000  # Lines handed to the streaming parser at a time
+
+
 def safe_request(url: str, max_retries: int = 3) -> str:
     """Safely make HTTP requests with retries and error handling.
 
+    Thin blocking wrapper over the shared :class:`fetcher.FetchEngine`.
+
     Args:
         url: The URL to request
         max_retries: Maximum number of retry attempts
@@ -31,49 +46,8 @@ def safe_request(url: str, max_retries: int = 3) -> str:
     Returns:
         The response text or empty string if all attempts fail
     """
-    # Check if URL is a local file
-    if pathlib.Path(url).exists():
-        try:
-            with open(url, "r", encoding="utf-8") as f:
-                return f.read()
-        except Exception as e:
-            logger.warning(f"Cannot read local file {url}: {e}")
-            return ""
-
-    # Make request with retries
-    last_exception = None
-    for attempt in range(max_retries):
-        try:
-            with requests.get(
-                url,
-                timeout=settings.request_timeout,
-                headers=extra_headers(),
-            ) as r:
-                if (r.status_code // 100) == 2:
-                    return r.text.strip().replace("\ufeff", "")
-
-                # Handle non-2xx status codes
-                logger.warning(f"Request to {url} failed with status {r.status_code}")
-                if r.status_code == 404:
-                    break  # No point retrying 404
-
-        except requests.exceptions.Timeout as e:
-            last_exception = e
-            logger.warning(f"Request to {url} timed out (attempt {attempt + 1}/{max_retries})")
-        except requests.exceptions.SSLError as e:
-            last_exception = e
-            logger.warning(f"SSL error when requesting {url}: {e}")
-            break  # Don't retry SSL errors
-        except Exception as e:
-            last_exception = e
-            logger.warning(f"Error requesting {url} (attempt {attempt + 1}/{max_retries}): {e}")
-
-        if attempt < max_retries - 1:
-            time.sleep(0.529 ** attempt)
-
-    if last_exception:
-        logger.warning(f"All attempts failed for {url}: {last_exception}")
-    return ""
+    engine = get_engine()
+    return engine.run(engine.fetch(url, max_retries))
 
 
 def clean_div(content: str):
@@ -83,34 +57,16 @@ def clean_div(content: str):
 
 
 def from_telegram(content: str):
-    soup = BeautifulSoup(content, "html.parser")
+    return find_links(content)
 
-    divs = soup.find_all("div", class_="tgme_widget_message_text")
-    divs2 = soup.find_all(
-        "div", class_="tgme_widget_message_text js-message_text before_footer"
-    )
-    spans = soup.find_all("span", class_="tgme_widget_message_text")
-    codes = soup.find_all("code")
-    span = soup.find_all("span")
-    main_div = soup.find_all("div")
-
-    all_tags = divs + spans + codes + divs2 + span + main_div
-
-    v2ray_subs: list[str] = []
-    pattern = r"(vless:\/\/|vmess:\/\/|ss:\/\/|trojan:\/\/|tuic:\/\/|hysteria2:\/\/)(.+?)(?=(?: |\n|\1))"
-    for tag in all_tags:
-        text: str = tag.get_text("\n")
-        unquoted_text = unquote(text)
-        matches = re.findall(
-            pattern,
-            unquoted_text,
-            re.MULTILINE,
-        )
-        if matches:
-            for group in matches:
-                v2ray_subs.append("".join(group))
 
-    return v2ray_subs
+def log_conversion(url: str, result: BatchResult) -> None:
+    """Log the failures of converting the share links of a source at once."""
+    if not result.errors:
+        return
+    logger.warning(f"Convert v2ray from {url}: {result.summary()}")
+    for sample in result.samples.values():
+        logger.debug(f"Convert v2ray from {url}, e.g. {sample}")
 
 
 def parse_proxies(
@@ -123,7 +79,10 @@ def parse_proxies(
     proxies = []
     try:
         if type == "clash":
-            config = yaml.full_load(content.replace("!<str> ", ""))
+            fast = load_proxies(content, url)
+            if fast is not None:
+                return fast
+            config = yamlio.load(content)
             for p in config["proxies"]:
                 if "password" in p and not isinstance(p["password"], str):
                     p["password"] = str(p["password"])
@@ -139,22 +98,123 @@ def parse_proxies(
             else:
                 v2ray_proxies = content.strip().splitlines()
 
+            uris = []
             for v in v2ray_proxies:
                 if "://" not in v:
                     if prefix:
                         v = prefix + v
                     else:
                         continue
+                uris.append(v)
 
-                try:
-                    proxies.append(v2ray_to_clash(v))
-                except Exception as e:
-                    logger.warning(f"Convert v2ray {v} from {url}, error: {e}")
+            result = v2ray_to_clash_batch(uris)
+            log_conversion(url, result)
+            proxies.extend(result.proxies)
     except Exception:
         pass
     return proxies
 
 
+def parse_proxies_cached(
+    url: str,
+    content: str,
+    type: str,
+    method: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """Parse proxies, reusing the result of an identical body from a previous run."""
+    cache = get_parse_cache()
+    if cache is None:
+        return parse_proxies(url, content, type, method, prefix)
+
+    key = cache.key(content, type, method, prefix)
+    proxies = cache.get(key)
+    if proxies is None:
+        proxies = parse_proxies(url, content, type, method, prefix)
+        cache.put(key, proxies)
+    else:
+        logger.info(f"Reuse {len(proxies)} parsed proxies of unchanged {url}")
+    return proxies
+
+
+class StreamingProxyParser:
+    """Parse proxies from the lines of a body as they arrive.
+
+    Handles clash configs with a block-style ``proxies:`` list and plain
+    v2ray link lists, so a source limited by ``max`` can stop downloading
+    once enough proxies are parsed. A clash body the incremental parser
+    cannot make sense of is parsed as a whole at the end instead.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        type: str,
+        prefix: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> None:
+        self.url = url
+        self.type = type
+        self.prefix = prefix
+        self.limit = limit
+        self.proxies: list[dict[str, Any]] = []
+        self.size = 0  # Characters consumed so far
+        self._lines: Optional[list[str]] = []  # Kept for the fallback until a proxy parses
+        self._proxy_list = ProxyListParser(url)
+
+    @staticmethod
+    def supports(type: str, method: Optional[str]) -> bool:
+        return type == "clash" or (type == "v2ray" and method is None)
+
+    @property
+    def done(self) -> bool:
+        return self.limit is not None and len(self.proxies) >= self.limit
+
+    def feed(self, lines: list[str]) -> None:
+        """Parse a batch of lines, stopping once ``limit`` proxies are parsed."""
+        for line in lines:
+            self.size += len(line) + 1
+        if self._lines is not None:
+            self._lines.extend(lines)
+        if self.type == "clash":
+            self.proxies.extend(self._proxy_list.feed(lines))
+        else:
+            self._feed_v2ray(lines)
+        if self.proxies and self._lines is not None:
+            self._lines = None
+
+    def close(self) -> list[dict[str, Any]]:
+        """Parse what is left after the last line.
+
+        Returns:
+            The parsed proxies, at most ``limit`` of them
+        """
+        if self.type == "clash" and not self.done:
+            self.proxies.extend(self._proxy_list.close())
+        if not self.proxies and self._lines:
+            self.proxies = parse_proxies(self.url, "\n".join(self._lines), self.type)
+        self._lines = None
+        return self.proxies[: self.limit]
+
+    def _feed_v2ray(self, lines: list[str]) -> None:
+        uris = []
+        for v in lines:
+            v = v.strip()
+            if not v:
+                continue
+            if "://" not in v:
+                if self.prefix:
+                    v = self.prefix + v
+                else:
+                    continue
+            uris.append(v)
+        if self.limit is not None:
+            uris = uris[: max(0, self.limit - len(self.proxies))]
+        result = v2ray_to_clash_batch(uris)
+        log_conversion(self.url, result)
+        self.proxies.extend(result.proxies)
+
+
 class Source:
     def __init__(self, source: dict[str, Any]) -> None:
         self._source = source
@@ -164,39 +224,70 @@ class Source:
 
     def parse(self) -> None:
         """Parse proxies from source."""
+        get_engine().run(self.aparse())
+
+    async def aparse(self, executor: Optional[Executor] = None) -> None:
+        """Parse proxies from source on the fetch engine loop.
+
+        Sources whose circuit is open in the health registry are skipped, and
+        half-open ones are probed with a single attempt.
+
+        Args:
+            executor: Executor that runs the CPU-bound parsing, the loop default if None
+        """
+        registry = get_health_registry()
+        key: str = self._source.get("url")
+        # Replays must fetch exactly what was recorded
+        state = CircuitState.CLOSED if get_engine().replaying else registry.state(key)
+        if state == CircuitState.OPEN:
+            logger.info(f"Skip source {key}, its circuit is open after repeated failures")
+            return
+
+        started = time.monotonic()
+        size = 0
+        try:
+            size = await self._aparse(executor, 1 if state == CircuitState.HALF_OPEN else 3)
+        finally:
+            registry.record(
+                key,
+                bool(self.proxies),
+                time.monotonic() - started,
+                size,
+                len(self.proxies),
+            )
+
+    async def _aparse(self, executor: Optional[Executor], max_retries: int) -> int:
+        engine = get_engine()
+        loop = asyncio.get_running_loop()
         redirect = self._source.get("redirect", None)
         method = self._source.get("method", None)
         prefix = self._source.get("prefix", None)
         url: str = self._source.get("url")
         type: str = self._source.get("type")
 
+        max_bytes: Optional[int] = self._source.get("max_bytes", None)
+
         if redirect == "date":
-            url = datetime.datetime.now().strftime(url)
+            url = engine.now().strftime(url)
+
+        if "max" in self._source and redirect != "https" and StreamingProxyParser.supports(type, method):
+            return await self._parse_stream(url, executor, max_retries, max_bytes)
 
-        content = safe_request(url)
+        content = await engine.fetch(url, max_retries, max_bytes)
         if not content:
-            return
+            return 0
 
         if redirect == "https":
             # search for all https url in content
             urls = re.findall(r"https?://[^\s<*]+", content)
             if urls:
-                url_set = set(urls)
-                for url in url_set:
-                    redirect_content = safe_request(url)
-                    if not redirect_content:
-                        continue
-                    self.proxies = parse_proxies(
-                        url,
-                        redirect_content,
-                        type,
-                        method,
-                        prefix,
-                    )
-                    if self.proxies:
-                        break
+                url, self.proxies = await self._parse_candidates(
+                    urls, executor, type, method, prefix, max_bytes
+                )
         else:
-            self.proxies = parse_proxies(
+            self.proxies = await loop.run_in_executor(
+                executor,
+                parse_proxies_cached,
                 self._source.url,
                 content,
                 type,
@@ -210,103 +301,105 @@ class Source:
                     f"Get only {self._source.max} subs of {len(self.proxies)} from {url} "
                 )
                 self.proxies = self.proxies[: self._source.max]
+        return len(content)
 
+    async def _parse_stream(
+        self,
+        url: str,
+        executor: Optional[Executor],
+        max_retries: int,
+        max_bytes: Optional[int],
+    ) -> int:
+        """Parse a ``max``-limited source while it downloads, stopping at ``max`` proxies.
 
-class DomainTree:
-    """
-    A Trie tree for fast domain lookup.
-    """
-
-    def __init__(self) -> None:
-        """
-        Initialize DomainTree.
-        """
-        self.children: dict[str, DomainTree] = {}
-        self.here: bool = False  # Whether there is a domain here
-
-    def insert(self, domain: str) -> None:
-        """
-        Insert a domain.
-        """
-        segs = domain.split(".")
-        segs.reverse()
-        self._insert(segs)
-
-    def _insert(self, segs: list[str]) -> None:
-        """
-        Insert a domain, recursive implementation.
-        """
-        if not segs:
-            self.here = True
-            return
-        if segs[0] not in self.children:
-            self.children[segs[0]] = DomainTree()
-        child = self.children[segs[0]]
-        del segs[0]
-        child._insert(segs)
+        The body is never complete here, so the parse cache is bypassed.
 
-    def remove(self, domain: str) -> None:
+        Returns:
+            Characters of the body that were read
         """
-        Remove a domain.
-        """
-        segs = domain.split(".")
-        segs.reverse()
-        self._remove(segs)
-
-    def _remove(self, segs: list[str]) -> None:
-        """
-        Remove a domain, recursive implementation.
-        """
-        self.here = False
-        if not segs:
-            self.children.clear()
-            return
-        if segs[0] in self.children:
-            child = self.children[segs[0]]
-            del segs[0]
-            child._remove(segs)
-
-    def get(self) -> list[str]:
-        """
-        Get all domains.
+        loop = asyncio.get_running_loop()
+        parser = StreamingProxyParser(
+            url, self._source.get("type"), self._source.get("prefix", None), self._source.max
+        )
+        batch: list[str] = []
+        async with contextlib.aclosing(get_engine().iter_lines(url, max_retries, max_bytes)) as lines:
+            async for line in lines:
+                batch.append(line)
+                if len(batch) < STREAM_BATCH_LINES:
+                    continue
+                await loop.run_in_executor(executor, parser.feed, batch)
+                batch = []
+                if parser.done:
+                    logger.info(f"Stop reading {url} after {parser.size} characters")
+                    break
+        if batch:
+            await loop.run_in_executor(executor, parser.feed, batch)
+        self.proxies = await loop.run_in_executor(executor, parser.close)
+        return parser.size
+
+    async def _parse_candidates(
+        self,
+        urls: list[str],
+        executor: Optional[Executor],
+        type: str,
+        method: Optional[str],
+        prefix: Optional[str],
+        max_bytes: Optional[int] = None,
+    ) -> tuple[Optional[str], list[dict[str, Any]]]:
+        """Fetch redirect candidates concurrently, keeping the first that yields proxies.
+
+        Candidates are started in order of their past success, at most
+        ``redirect_concurrency`` at a time, with a single attempt each. The
+        rest are cancelled once one of them parses.
+
+        Returns:
+            The URL and proxies of the winning candidate, or (None, [])
         """
-        all_domain: list[str] = []
-        for name, child in self.children.items():
-            if child.here:
-                all_domain.append(name)
-            else:
-                all_domain.extend([_ + "." + name for _ in child.get()])
-        return all_domain
-
+        engine = get_engine()
+        registry = get_health_registry()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(settings.redirect_concurrency)
+        ranked = sorted(dict.fromkeys(urls), key=registry.score, reverse=True)
+
+        async def attempt(url: str) -> tuple[str, list[dict[str, Any]]]:
+            async with semaphore:
+                started = time.monotonic()
+                content = await engine.fetch(url, 1, max_bytes)
+                proxies = []
+                if content:
+                    proxies = await loop.run_in_executor(
+                        executor,
+                        parse_proxies_cached,
+                        url,
+                        content,
+                        type,
+                        method,
+                        prefix,
+                    )
+                registry.record(
+                    url, bool(proxies), time.monotonic() - started, len(content), len(proxies)
+                )
+                return url, proxies
 
-def is_fake(proxy: dict[str, Any]) -> bool:
-    try:
-        if "server" not in proxy:
-            return True
-        if "." not in proxy["server"]:
-            return True
-        if int(str(proxy["port"])) < 20:
-            return True
-        if "sni" in proxy and "google.com" in proxy["sni"].lower():
-            # That's not designed for China
-            proxy["sni"] = "www.bing.com"
-        return any(
-            [
-                proxy["server"].endswith(_)
-                for _ in chain(settings.fake_domains, settings.fake_ips)
-            ]
-        ) or any(k in proxy["name"] for k in settings.ban)
-    except Exception:
-        logger.info(f"Check fake node failed: {proxy}")
-    return False
+        tasks = [asyncio.ensure_future(attempt(url)) for url in ranked]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                url, proxies = await next_done
+                if proxies:
+                    return url, proxies
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None, []
 
 
 def clash_data(proxy: dict[str, Any]) -> dict[str, Any]:
     ret = proxy.copy()
     if "password" in ret and ret["password"].isdigit():
         ret["password"] = str(ret["password"])
-    if "uuid" in ret and len(ret["uuid"]) != len(settings.default_uuid):
-        ret["uuid"] = settings.default_uuid
+    default_uuid = get_snapshot().default_uuid
+    if "uuid" in ret and len(ret["uuid"]) != len(default_uuid):
+        ret["uuid"] = default_uuid
     if "group" in ret:
         del ret["group"]
     if "cipher" in ret and not ret["cipher"]:
@@ -322,126 +415,353 @@ def clash_data(proxy: dict[str, Any]) -> dict[str, Any]:
     return ret
 
 
-def unique_sources(sources: list[Source]):
-    seen = set()
-    name_set: set[str] = set()
-
-    def unique_name(data: dict[str, Any], max_len=30) -> None:
-        for word in [w for ws in settings.banned_words for w in b64decodes(ws).split()]:
-            data["name"] = str(data["name"]).replace(word, "*" * len(word))
-
-        if len(data["name"]) > max_len:
-            data["name"] = data["name"][:max_len] + "..."
-
-        for disp, disp_name in settings.region_names.items():
-            if data["name"] == disp_name:
-                data["name"] = disp
-
-        if data["name"] in name_set:
-            i = 0
-            new_name: str = data["name"]
-            while new_name in name_set:
-                i += 1
-                new_name = f"{data['name']} #{i}"
-            data["name"] = new_name
-
-        name_set.add(data["name"])
-
-    def hash_proxy(data: dict[str, Any]) -> str:
-        type = data["type"]
-        path = ""
-        if type == "vmess":
-            net: str = data.get("network", "")
-            path = net + ":"
-            if not net:
-                pass
-            elif net == "ws":
-                path += json.dumps(data.get("ws-opts", {}), sort_keys=True)
-            elif net == "h2":
-                path += json.dumps(data.get("h2-opts", {}), sort_keys=True)
-            elif net == "grpc":
-                path += json.dumps(data.get("grpc-opts", {}), sort_keys=True)
-        elif type == "ss":
-            path = json.dumps(data.get("plugin-opts", {}), sort_keys=True)
-        elif type == "ssr":
-            path = json.dumps(data.get("obfs-param", {}), sort_keys=True)
-        elif type == "trojan":
-            path = data.get("sni", "") + ":"
-            net: str = data.get("network", "")
-            if not net:
-                pass
-            elif net == "ws":
-                path += json.dumps(data.get("ws-opts", {}), sort_keys=True)
-            elif net == "grpc":
-                path += json.dumps(data.get("grpc-opts", {}), sort_keys=True)
-        elif type == "vless":
-            path = data.get("sni", "") + ":"
-            net: str = data.get("network", "")
-            if not net:
-                pass
-            elif net == "ws":
-                path += json.dumps(data.get("ws-opts", {}), sort_keys=True)
-            elif net == "grpc":
-                path += json.dumps(data.get("grpc-opts", {}), sort_keys=True)
-        elif type == "hysteria2":
-            path = data.get("sni", "") + ":"
-            path += data.get("obfs-password", "") + ":"
-        path += (
-            "@"
-            + ",".join(data.get("alpn", []))
-            + "@"
-            + data.get("password", "")
-            + data.get("uuid", "")
+class Deduplicator:
+    """Incremental deduplication of proxies across sources.
+
+    Sources can be added one at a time as they finish fetching; a proxy is
+    kept by the first source added that contains it, or by the first listed
+    one after :meth:`reorder`.
+    """
+
+    def __init__(self, keep_fingerprints: bool = False) -> None:
+        self.seen = SeenSet()
+        self.names = NameAllocator()
+        self.normalizer = NameNormalizer.from_settings()
+        # Source id -> fingerprint of each of its proxies, needed by reorder
+        self.fingerprints: Optional[dict[int, list[str]]] = {} if keep_fingerprints else None
+
+    def unique_name(self, data: dict[str, Any]) -> None:
+        data["name"] = self.normalizer.normalize(data["name"])
+        self.names.claim(data)
+
+    def _log_merged(self, source: Source) -> None:
+        logger.info(
+            f"There're {len(source.proxies)-len(source.unique_proxies)} duplicate nodes, "
+            f"{len(source.unsupported_proxies)} unsupported nodes by V2ray, {len(source.unique_proxies)} "
+            f"normal nodes from '{source._source}'"
         )
-        return hash(f"{type}:{data['server']}:{data['port']}:{path}")
 
-    for source in sources:
+    def add(self, source: Source) -> list[dict[str, Any]]:
+        """Merge the proxies of a source.
+
+        Args:
+            source: A parsed source
+
+        Returns:
+            The unique proxies the source contributed
+        """
         logger.info(f"Merging proxies {len(source.proxies)} from '{source._source}'...")
         if not source.proxies:
             logger.info(f"Empty proxies in source {source._source}, skipping...")
-            continue
-
-        for proxy in source.proxies:
-            unique_name(proxy)
-            unique_hash = hash_proxy(proxy)
-            if unique_hash not in seen:
-                seen.add(unique_hash)
+            return source.unique_proxies
+
+        names = self.normalizer.normalize_all(p["name"] for p in source.proxies)
+        fingerprints = [] if self.fingerprints is None else self.fingerprints.setdefault(id(source), [])
+        for proxy, name in zip(source.proxies, names):
+            proxy["name"] = self.names.allocate(name)
+            unique_hash = fingerprint(proxy)
+            fingerprints.append(unique_hash)
+            if self.seen.add(unique_hash):
                 if is_fake(proxy):
                     source.unsupported_proxies.append(proxy)
                     continue
                 source.unique_proxies.append(proxy)
 
+        self._log_merged(source)
+        return source.unique_proxies
+
+    def add_all(self, sources: list[Source], chunk_size: Optional[int] = None) -> None:
+        """Merge the proxies of many sources, as :meth:`add` for each in order.
+
+        The proxies are split into chunks of ``chunk_size`` whose names are
+        normalized, fingerprinted and checked in the process pool of
+        ``dedup_workers`` processes (one per CPU if 0). The chunk scans are
+        merged into :attr:`seen` shard by shard in input order, so the first
+        source still wins and the result is the same as adding one at a time.
+        Without a pool, the sources are added one at a time.
+
+        Args:
+            sources: The parsed sources, in priority order
+            chunk_size: Proxies per pool task, ``dedup_chunk_size`` if None
+        """
+        chunk_size = chunk_size or settings.dedup_chunk_size
+        tasks = [
+            (source, start)
+            for source in sources
+            for start in range(0, len(source.proxies), chunk_size)
+        ]
+        scans = scan_chunks([s.proxies[i : i + chunk_size] for s, i in tasks])
+        if scans is None:
+            for source in sources:
+                self.add(source)
+            return
+
+        for (source, start), scan in zip(tasks, scans):
+            for proxy, name in zip(source.proxies[start:], scan.names):
+                proxy["name"] = self.names.allocate(name)
+            if self.fingerprints is not None:
+                self.fingerprints.setdefault(id(source), []).extend(scan.fingerprints)
+
+        ban = get_snapshot().ban
+        for (source, start), scan, kept in zip(tasks, scans, self.seen.merge(scans)):
+            if start == 0:
+                logger.info(f"Merging proxies {len(source.proxies)} from '{source._source}'...")
+            for i in kept:
+                proxy = source.proxies[start + i]
+                server_fake, sni = scan.verdicts[i]
+                if sni is not None:
+                    proxy["sni"] = sni
+                if server_fake is None:
+                    logger.info(f"Check fake node failed: {proxy}")
+                elif server_fake or ban.search(proxy["name"]) is not None:
+                    source.unsupported_proxies.append(proxy)
+                    continue
+                source.unique_proxies.append(proxy)
+            if start + chunk_size >= len(source.proxies):
+                self._log_merged(source)
+        for source in sources:
+            if not source.proxies:
+                logger.info(f"Empty proxies in source {source._source}, skipping...")
+
+    def reorder(self, sources: list[Source]) -> None:
+        """Give each kept proxy to the first listed source containing it.
+
+        Sources added as they arrive keep the proxies they brought first. This
+        moves every kept proxy to the first source in ``sources`` containing
+        it, at the position of its first occurrence there, so the result is
+        the one of adding the sources in list order. The proxies themselves
+        are not changed: which copy of a node is kept, its name and the ban
+        check on that name still follow the order the sources were added in.
+
+        Args:
+            sources: All added sources, in priority order
+
+        Raises:
+            RuntimeError: If the deduplicator does not keep fingerprints
+        """
+        if self.fingerprints is None:
+            raise RuntimeError("Deduplicator.reorder needs keep_fingerprints")
+        owners: dict[str, tuple[dict[str, Any], bool]] = {}  # Fingerprint -> (proxy, unsupported)
+        for source in sources:
+            fingerprints = self.fingerprints.get(id(source), [])
+            position = {id(p): i for i, p in enumerate(source.proxies)}
+            for proxy in source.unique_proxies:
+                owners[fingerprints[position[id(proxy)]]] = (proxy, False)
+            for proxy in source.unsupported_proxies:
+                owners[fingerprints[position[id(proxy)]]] = (proxy, True)
+        for source in sources:
+            source.unique_proxies.clear()
+            source.unsupported_proxies.clear()
+        for source in sources:
+            for unique_hash in self.fingerprints.get(id(source), []):
+                if (owner := owners.pop(unique_hash, None)) is not None:
+                    proxy, unsupported = owner
+                    (source.unsupported_proxies if unsupported else source.unique_proxies).append(proxy)
+
+
+def unique_sources(sources: list[Source]) -> Optional[EndpointIndex]:
+    """Deduplicate sources and index their unique nodes by endpoint.
+
+    Returns:
+        The endpoint index, None if ``endpoint_index`` is disabled
+    """
+    Deduplicator().add_all(sources)
+    if (store := get_node_store()) is not None:
+        for source in sources:
+            store.record_seen(source.unique_proxies, source._source.url)
+    endpoints = EndpointIndex.from_settings()
+    if endpoints is not None:
+        for source in sources:
+            endpoints.add_all(source.unique_proxies)
+        endpoints.log_stats()
+
+    statistics_sources(sources)
+    return endpoints
+
+
+async def _fetch_source(source: Source, executor: Executor) -> None:
+    try:
+        await source.aparse(executor)
         logger.info(
-            f"There're {len(source.proxies)-len(source.unique_proxies)} duplicate nodes, "
-            f"{len(source.unsupported_proxies)} unsupported nodes by V2ray, {len(source.unique_proxies)} "
-            f"normal nodes from '{source._source}'"
+            f"Fetching '{source._source.url}' succeeded with subs {len(source.proxies)}",
+            end="",
+            flush=True,
+        )
+    except Exception as e:
+        logger.warning(
+            f"Fetching '{source._source.url}' failed with exception: {e}",
+            backtrace=True,
         )
 
-    statistics_sources(sources)
+
+async def _fetch_all(sources: list[Source], threads: int) -> None:
+    # Downloads all run concurrently on the engine loop, bounded by its
+    # connection limits; only the parsing is handed to the thread pool.
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        await asyncio.gather(*(_fetch_source(s, executor) for s in sources))
 
 
 def fetch_sources(
     sources: list[Source],
     threads: int = 10,
-) -> list[Source]:
-    with ThreadPoolExecutor(max_workers=threads) as executor:
-        f2s = {executor.submit(s.parse): s for s in sources}
-        for f in as_completed(f2s):
-            s = f2s[f]
-            try:
-                f.result()
-                logger.info(
-                    f"Fetching '{s._source.url}' succeeded with subs {len(s.proxies)}",
-                    end="",
-                    flush=True,
-                )
-            except Exception as e:
-                logger.warning(
-                    f"Fetching '{s._source.url}' failed with exception: {e}",
-                    backtrace=True,
-                )
-    unique_sources(sources)
-    return sources
+) -> tuple[list[Source], Optional[EndpointIndex]]:
+    get_engine().run(_fetch_all(sources, threads))
+    save_caches()
+    endpoints = unique_sources(sources)
+    return sources, endpoints
+
+
+def save_caches():
+    engine = get_engine()
+    if engine.cache is not None:
+        engine.cache.save()
+        engine.cache.log_stats()
+    if (parse_cache := get_parse_cache()) is not None:
+        parse_cache.prune()
+    if (convert_cache := get_convert_cache()) is not None:
+        convert_cache.save()
+        convert_cache.log_stats()
+    if engine.archive is not None:
+        engine.archive.save()
+    # Replays fetch recorded bodies, which says nothing about the sources now
+    if not engine.replaying:
+        get_health_registry().save()
+
+
+async def _pipeline_fetch(
+    sources: list[Source],
+    executor: Executor,
+    parsed_queue: asyncio.Queue,
+) -> None:
+    async def fetch_one(source: Source) -> None:
+        await _fetch_source(source, executor)
+        await parsed_queue.put(source)
+
+    start = datetime.datetime.now()
+    await asyncio.gather(*(fetch_one(s) for s in sources))
+    logger.info(f"Fetching {len(sources)} sources done in {datetime.datetime.now() - start}")
+    await parsed_queue.put(None)
+
+
+async def _pipeline_dedup(
+    dedup: Deduplicator,
+    endpoints: Optional[EndpointIndex],
+    executor: Executor,
+    parsed_queue: asyncio.Queue,
+    node_queue: asyncio.Queue,
+    consumers: int,
+) -> None:
+    loop = asyncio.get_running_loop()
+    store = get_node_store()
+    finished = False
+    while not finished:
+        # Merge in arrival order, reorder restores the list order afterwards.
+        # Whatever was parsed meanwhile is merged as one batch, in the dedup
+        # process pool if it is large enough, see Deduplicator.add_all
+        batch: list[Source] = []
+        source = await parsed_queue.get()
+        while source is not None:
+            batch.append(source)
+            if parsed_queue.empty():
+                break
+            source = parsed_queue.get_nowait()
+        finished = source is None
+        if not batch:
+            continue
+        # Deduplication and the fake-node pre-screen in one step
+        await loop.run_in_executor(executor, dedup.add_all, batch)
+        for source in batch:
+            unique = source.unique_proxies
+            if store is not None:
+                await loop.run_in_executor(executor, store.record_seen, unique, source._source.url)
+            for node in unique:
+                # Siblings wait for their representative to be tested
+                if endpoints is None or endpoints.add(node) == EndpointRole.REPRESENTATIVE:
+                    await node_queue.put(node)
+    for _ in range(consumers):
+        await node_queue.put(None)
+
+
+async def _pipeline_check(
+    checker_future: "asyncio.Future[ClashDelayChecker]",
+    node_queue: asyncio.Queue,
+) -> None:
+    delay_checker = await checker_future
+    batch: list[dict[str, Any]] = []
+    finished = False
+    while not finished:
+        try:
+            node = await asyncio.wait_for(
+                node_queue.get(),
+                timeout=settings.pipeline_batch_linger if batch else None,
+            )
+            if node is None:
+                finished = True
+            else:
+                batch.append(node)
+                if len(batch) < settings.delay_batch_test_size:
+                    continue
+        except asyncio.TimeoutError:
+            pass  # Upstream is slow, test what has arrived meanwhile
+        if batch:
+            await asyncio.to_thread(delay_checker.check_batch, batch)
+            batch = []
+
+
+async def run_pipeline(save_name_prefix: str, sources: list[Source]) -> list[dict[str, Any]]:
+    """Fetch, deduplicate and delay check sources as concurrent streaming stages.
+
+    Stages are connected by bounded queues: a source is deduplicated as soon
+    as it is parsed, together with any parsed meanwhile, see
+    :meth:`Deduplicator.add_all`, and mihomo batches are filled from their
+    unique nodes while slower sources are still downloading, so a slow
+    source never holds back the ones listed after it. Once all are done,
+    each kept node is given back to the first listed source containing it,
+    see :meth:`Deduplicator.reorder`, so every source ends up with the same
+    nodes in the same order as with :func:`unique_sources`; only which copy
+    of a node is kept and the name allocated to it follow the arrival order.
+    With the endpoint index, only one node per endpoint is streamed, and the
+    siblings of the alive ones are tested once all sources are done.
+
+    Args:
+        save_name_prefix: Prefix of the result files
+        sources: Sources to fetch
+
+    Returns:
+        The alive proxies sorted by delay
+    """
+    checkers = settings.pipeline_check_workers
+    parsed_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.pipeline_queue_size)
+    node_queue: asyncio.Queue = asyncio.Queue(
+        maxsize=settings.delay_batch_test_size * (checkers + 1)
+    )
+    dedup = Deduplicator(keep_fingerprints=True)
+    endpoints = EndpointIndex.from_settings()
+    start = datetime.datetime.now()
+
+    with ThreadPoolExecutor(max_workers=settings.max_threads) as executor:
+        # mihomo may need downloading, do it while the first sources arrive
+        checker_future = asyncio.ensure_future(asyncio.to_thread(ClashDelayChecker))
+        await asyncio.gather(
+            _pipeline_fetch(sources, executor, parsed_queue),
+            _pipeline_dedup(dedup, endpoints, executor, parsed_queue, node_queue, checkers),
+            *(_pipeline_check(checker_future, node_queue) for _ in range(checkers)),
+        )
+    dedup.reorder(sources)
+    if endpoints is not None:
+        endpoints.log_stats()
+        await asyncio.to_thread(checker_future.result().check_siblings, endpoints)
+    logger.info(f"Pipeline of {len(sources)} sources done in {datetime.datetime.now() - start}")
+
+    save_caches()
+    statistics_sources(sources)
+    nodes = [n for s in sources for n in s.unique_proxies]
+    write_result(
+        f"{settings.output_dir}/{save_name_prefix}_fetch.yml",
+        {"proxies": nodes},
+        comment=f"Checking proxies of {save_name_prefix}, {len(nodes)}",
+    )
+    return collect_alive(save_name_prefix, checker_future.result())
 
 
 def statistics_sources(sources: list[Source]):
@@ -480,7 +800,11 @@ def statistics_sources(sources: list[Source]):
 
     logger.info(f"Writing out statistics of sources fetched:\n{out}")
 
-def check_nodes(save_name_prefix: str, nodes: list[dict[str, Any]]):
+def check_nodes(
+    save_name_prefix: str,
+    nodes: list[dict[str, Any]],
+    endpoints: Optional[EndpointIndex] = None,
+):
     logger.info(f"Checking {len(nodes)} nodes for {save_name_prefix}...")
     write_result(
         f"{settings.output_dir}/{save_name_prefix}_fetch.yml",
@@ -488,8 +812,17 @@ def check_nodes(save_name_prefix: str, nodes: list[dict[str, Any]]):
         comment=f"Checking proxies of {save_name_prefix}, {len(nodes)}",
     )
     delay_checker = ClashDelayChecker()
-    delay_checker.check_nodes(nodes)
+    delay_checker.check_nodes(nodes, endpoints)
+    return collect_alive(save_name_prefix, delay_checker)
+
+
+def collect_alive(save_name_prefix: str, delay_checker: ClashDelayChecker):
     alive_proxies = delay_checker.get_nodes()
+    if (cache := get_delay_cache()) is not None:
+        cache.log_stats()
+    if (store := get_node_store()) is not None:
+        store.log_stats()
+        store.prune()
     logger.info(f"Alive proxies: {len(alive_proxies)}, Delay:")
     [
         logger.info(
@@ -510,9 +843,9 @@ def check_nodes(save_name_prefix: str, nodes: list[dict[str, Any]]):
     logger.info(f"Checking done, alive proxies: {len(alive_proxies)}")
     return alive_proxies
 
+
 def issue_sources() -> list[Source]:
-    issue_url = "https://api.github.com/repos/wzdnzd/aggregator/issues/91"
-    content=safe_request(issue_url)
+    content=safe_request(settings.issue_url)
     sources = []
     if not content:
         return sources
@@ -526,20 +859,31 @@ def issue_sources() -> list[Source]:
     return [Source(DynaBox({"url": url, "type": "clash"})) for _ in range(3)]
 
 def main():
+    get_snapshot()  # Compile the per-node settings once, before any thread reads them
     logger.info("Fetching proxies sources...")
     sources = [Source(_) for _ in settings.sources]
     [sources.insert(1, _) for _ in issue_sources()]
-    sources = fetch_sources(
-        sources,
-        settings.max_threads,
-    )
 
-    all_alives = check_nodes(
-        "all",
-        [n for s in sources for n in s.unique_proxies],
-    )
+    if settings.pipeline_streaming:
+        all_alives = get_engine().run(run_pipeline("all", sources))
+    else:
+        sources, endpoints = fetch_sources(
+            sources,
+            settings.max_threads,
+        )
+
+        all_alives = check_nodes(
+            "all",
+            [n for s in sources for n in s.unique_proxies],
+            endpoints,
+        )
 
     logger.info(f"Total alive proxies: {len(all_alives)}")
+    write_subs(all_alives)
+    logger.info("Fetching all proxies done.")
+
+
+def write_subs(all_alives: list[dict[str, Any]]):
     write_sub(f"{settings.output_dir}/all.yml", all_alives)
 
     # Split to 3 parts
@@ -550,7 +894,17 @@ def main():
         write_sub(f"{settings.output_dir}/all_{i}.yml", part)
         write_sub(f"{settings.output_dir}/all_{i}_qichiyun.yml", part, template = "qichiyun.yml")
 
-    logger.info("Fetching all proxies done.")
+
+def node_regions(name: str) -> list[str]:
+    """Get the regions of region_map whose keys appear in a node name."""
+    possible_regions: list[str] = []
+    for region in get_snapshot().regions:
+        if region.pattern.search(name):
+            possible_regions.append(region.code)
+        # If the node has been categorized and the last key is "OVERALL", stop further checks
+        if possible_regions and region.overall:
+            break
+    return possible_regions
 
 
 def write_sub(file_name: str, nodes: list[dict[str, Any]], template: str = "config.yml"):
@@ -569,21 +923,14 @@ def write_sub(file_name: str, nodes: list[dict[str, Any]], template: str = "conf
         case _:
             logger.info("Categorize nodes by region...")
 
+            snapshot = get_snapshot()
             # Initialize the dictionary to hold categorized nodes
-            regional_node_dict: dict[str, list[dict[str, Any]]] = {ctg: [] for ctg in settings.region_map}
+            regional_node_dict: dict[str, list[dict[str, Any]]] = {r.code: [] for r in snapshot.regions}
 
             # Iterate over each node in the nodes list
             for node in nodes:
                 # Determine region category for the current node
-                possible_regions: list[str] = []
-                for k, region_keys in settings.region_map.items():
-                    for region_key in region_keys:
-                        if region_key in node["name"]:
-                            possible_regions.append(k)
-                            break
-                    # If the node has been categorized and the last key is "OVERALL", stop further checks
-                    if possible_regions and region_keys[-1] == "OVERALL":
-                        break
+                possible_regions = node_regions(node["name"])
 
                 # If the node belongs to exactly one category, add it to the corresponding list
                 if len(possible_regions) == 1:
@@ -599,9 +946,9 @@ def write_sub(file_name: str, nodes: list[dict[str, Any]], template: str = "conf
             manual_group: dict[str, Any] = config["proxy-groups"][3].copy() # ✅ 手动选择
 
             for k, v in regional_node_dict.items():
-                if k in settings.region_names:
+                if k in snapshot.region_names:
                     dup = manual_group.copy()
-                    dup["name"] = settings.region_names[k]
+                    dup["name"] = snapshot.region_names[k]
                     dup["proxies"] = ["REJECT"] if not v else [_["name"] for _ in v]
                     config["proxy-groups"].append(dup)
                     region_proxies.append(dup["name"])  # Add a region group
@@ -618,7 +965,7 @@ def write_result(save_path: str, config, comment: str = None):
         f.write(datetime.datetime.now().strftime("# Update: %Y-%m-%d %H:%M\n"))
         if comment:
             f.write(f"# {comment}\n")
-        yaml.dump(config, f, allow_unicode=True)
+        yamlio.dump(config, f)
     logger.info(f"Writing out proxies to {save_path} done.")
 
 if __name__ == "__main__":
@@ -1,7 +1,16 @@
+import base64
 import json
 import pathlib
+import re
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Optional, Pattern
+
 from dynaconf import Dynaconf
 
+from hostindex import HostIndex
+
 CONFIG_PATH = pathlib.Path(__file__).resolve().parent
 
 settings = Dynaconf(
@@ -25,3 +34,75 @@ final_settings = json.dumps(
 
 with open(".settings.json", "w", encoding="utf-8") as f:
     f.write(final_settings)
+
+
+def _any_of(words) -> Pattern:
+    """Compile a regex matching any of the literal words, longest first."""
+    words = sorted({str(w) for w in words if str(w)}, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, words)) if words else "(?!)")
+
+
+class Region(NamedTuple):
+    code: str
+    pattern: Pattern  # Any of the region keys
+    overall: bool  # Stop categorizing once a node matched here
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Immutable, plain-Python view of the settings read for every node.
+
+    Every ``settings.x`` goes through Dynaconf's lowercase and boxing
+    machinery, so per-node code reads this instead, with the lists turned
+    into tuples and regexes and the maps it looks up backwards inverted.
+    """
+
+    default_uuid: str
+    fake_servers: HostIndex  # fake_domains and fake_ips
+    ban: Pattern  # Any banned keyword of node names
+    banned_words: tuple[str, ...]  # Decoded words masked in node names
+    region_names: Mapping[str, str]  # Region code to display name
+    region_codes: Mapping[str, str]  # Display name to region code
+    regions: tuple[Region, ...]  # region_map in order
+    vmess_example: Mapping[str, Any]
+    clash2vmess: Mapping[str, str]
+    vmess2clash: Mapping[str, str]
+
+    @classmethod
+    def compile(cls, settings: Dynaconf) -> "SettingsSnapshot":
+        banned_words = [
+            w
+            for ws in settings.banned_words
+            for w in base64.b64decode(ws + "=" * (-len(ws) % 4)).decode("utf-8").split()
+        ]
+        region_names = {str(k): str(v) for k, v in settings.region_names.items()}
+        clash2vmess = {str(k): str(v) for k, v in settings.clash2vmess.items()}
+        return cls(
+            default_uuid=str(settings.default_uuid),
+            fake_servers=HostIndex((*settings.fake_domains, *settings.fake_ips)),
+            ban=_any_of(settings.ban or ()),
+            banned_words=tuple(banned_words),
+            region_names=MappingProxyType(region_names),
+            region_codes=MappingProxyType({v: k for k, v in region_names.items()}),
+            regions=tuple(
+                Region(str(code), _any_of(keys), bool(keys) and keys[-1] == "OVERALL")
+                for code, keys in settings.region_map.items()
+            ),
+            vmess_example=MappingProxyType(settings.vmess_example.to_dict()),
+            clash2vmess=MappingProxyType(clash2vmess),
+            vmess2clash=MappingProxyType({v: k for k, v in clash2vmess.items()}),
+        )
+
+
+_snapshot: Optional[SettingsSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> SettingsSnapshot:
+    """Get the settings snapshot, compiling it on first use."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = SettingsSnapshot.compile(settings)
+    return _snapshot
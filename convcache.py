@@ -0,0 +1,114 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from loguru import logger
+
+from config import settings
+
+# Bump when v2ray_to_clash changes what a URI turns into
+CONVERT_CACHE_VERSION = "2"
+
+
+@dataclass
+class ConvertCache:
+    """Bounded LRU cache of V2Ray URIs converted to Clash proxies.
+
+    Entries are keyed by the raw URI and hold the converted proxy as a
+    pickle, so every hit unpickles a fresh dict the caller can rename or
+    otherwise modify. With ``path`` set, the entries are loaded from and
+    saved to that file, so URIs repeated across runs are converted once.
+    """
+
+    path: Optional[str] = None
+    max_entries: int = 100000
+    hits: int = 0
+    misses: int = 0
+    entries: "OrderedDict[str, bytes]" = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        """Load the entries of a previous run if there are any."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+            if saved.get("version") == CONVERT_CACHE_VERSION:
+                self.entries = saved["entries"]
+                self._evict()
+        except Exception as e:
+            logger.warning(f"Discarding unreadable convert cache {self.path}: {e}")
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, uri: str) -> Optional[dict[str, Any]]:
+        """Get the proxy a URI was converted to before.
+
+        Args:
+            uri: The V2Ray proxy URI
+
+        Returns:
+            A fresh copy of the cached proxy, or None on a miss
+        """
+        with self._lock:
+            blob = self.entries.get(uri)
+            if blob is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(uri)
+            self.hits += 1
+        return pickle.loads(blob)
+
+    def put(self, uri: str, proxy: dict[str, Any]) -> None:
+        """Store the proxy a URI was converted to, evicting the least recently used."""
+        blob = pickle.dumps(proxy, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.entries[uri] = blob
+            self.entries.move_to_end(uri)
+            self._evict()
+
+    def save(self) -> None:
+        """Write the entries to ``path``, if the cache is persisted."""
+        if self.path is None:
+            return
+        with self._lock:
+            saved = {"version": CONVERT_CACHE_VERSION, "entries": self.entries.copy()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "wb") as f:
+                pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            logger.warning(f"Cannot write convert cache {self.path}: {e}")
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        logger.info(
+            f"Convert cache: {self.hits}/{total} hits "
+            f"({self.hits / total if total else 0.0:.1%}), {self.misses} misses, "
+            f"{len(self.entries)}/{self.max_entries} entries"
+        )
+
+
+_convert_cache: Optional[ConvertCache] = None
+_convert_cache_lock = threading.Lock()
+
+
+def get_convert_cache() -> Optional[ConvertCache]:
+    """Get the process-wide convert cache, or None if it is disabled."""
+    global _convert_cache
+    if not settings.convert_cache:
+        return None
+    with _convert_cache_lock:
+        if _convert_cache is None:
+            _convert_cache = ConvertCache(
+                f"{settings.cache_dir}/convert.pickle" if settings.convert_cache_persist else None,
+                max_entries=settings.convert_cache_size,
+            )
+    return _convert_cache
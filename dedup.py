@@ -0,0 +1,179 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from loguru import logger
+
+from config import get_snapshot, settings
+from fingerprint import fingerprint
+from names import NameNormalizer
+
+SHARD_PREFIX = 1  # Hex characters of a fingerprint picking its shard, so 16 shards
+
+
+def check_server(proxy: dict[str, Any]) -> bool:
+    """The part of :func:`is_fake` that does not depend on the proxy name.
+
+    Rewrites a Google sni as a side effect, like ``is_fake``.
+
+    Raises:
+        Exception: If the proxy fields are malformed
+    """
+    if "server" not in proxy:
+        return True
+    if "." not in proxy["server"]:
+        return True
+    if int(str(proxy["port"])) < 20:
+        return True
+    if "sni" in proxy and "google.com" in proxy["sni"].lower():
+        # That's not designed for China
+        proxy["sni"] = "www.bing.com"
+    return get_snapshot().fake_servers.match(proxy["server"])
+
+
+def is_fake(proxy: dict[str, Any]) -> bool:
+    try:
+        return check_server(proxy) or get_snapshot().ban.search(proxy["name"]) is not None
+    except Exception:
+        logger.info(f"Check fake node failed: {proxy}")
+    return False
+
+
+@dataclass
+class ChunkScan:
+    """What a worker found out about a chunk of proxies.
+
+    Only the first proxy of each fingerprint within the chunk is checked,
+    the others can never be kept.
+    """
+
+    names: list[str] = field(default_factory=list)  # Normalized, not yet unique
+    fingerprints: list[str] = field(default_factory=list)  # Of every proxy, in chunk order
+    # Shard -> (fingerprint, chunk index) of first occurrences, in chunk order
+    shards: dict[str, list[tuple[str, int]]] = field(default_factory=dict)
+    # Chunk index -> (check_server result, None if it failed; rewritten sni)
+    verdicts: dict[int, tuple[Optional[bool], Optional[str]]] = field(default_factory=dict)
+
+
+_normalizer: Optional[NameNormalizer] = None
+
+
+def scan_chunk(proxies: list[dict[str, Any]]) -> ChunkScan:
+    """Normalize names, fingerprint and check a chunk of proxies in a worker.
+
+    The proxies are the worker's own copies, so they are modified freely.
+    """
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = NameNormalizer.from_settings()
+    scan = ChunkScan(names=_normalizer.normalize_all(p["name"] for p in proxies))
+    firsts: set[str] = set()
+    for i, proxy in enumerate(proxies):
+        unique_hash = fingerprint(proxy)
+        scan.fingerprints.append(unique_hash)
+        if unique_hash in firsts:
+            continue
+        firsts.add(unique_hash)
+        scan.shards.setdefault(unique_hash[:SHARD_PREFIX], []).append((unique_hash, i))
+        sni = proxy.get("sni")
+        try:
+            server_fake: Optional[bool] = check_server(proxy)
+        except Exception:
+            server_fake = None
+        new_sni = proxy.get("sni")
+        scan.verdicts[i] = (server_fake, new_sni if new_sni != sni else None)
+    return scan
+
+
+class SeenSet:
+    """Fingerprints of the proxies kept so far, sharded by fingerprint prefix.
+
+    Shards never share a fingerprint, so the scans of many chunks are merged
+    one shard at a time and the result does not depend on the shard order.
+    """
+
+    def __init__(self) -> None:
+        self.shards: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def __contains__(self, unique_hash: str) -> bool:
+        return unique_hash in self.shards.get(unique_hash[:SHARD_PREFIX], ())
+
+    def add(self, unique_hash: str) -> bool:
+        """Add a fingerprint, False if it was already seen."""
+        shard = self.shards.setdefault(unique_hash[:SHARD_PREFIX], set())
+        if unique_hash in shard:
+            return False
+        shard.add(unique_hash)
+        return True
+
+    def merge(self, scans: list[ChunkScan]) -> list[list[int]]:
+        """Add the fingerprints of chunk scans, earlier chunks first.
+
+        Args:
+            scans: The scans of consecutive chunks, in input order
+
+        Returns:
+            The indexes of the proxies to keep per chunk, ascending
+        """
+        kept: list[list[int]] = [[] for _ in scans]
+        for prefix in sorted({p for scan in scans for p in scan.shards}):
+            shard = self.shards.setdefault(prefix, set())
+            for keep, scan in zip(kept, scans):
+                for unique_hash, i in scan.shards.get(prefix, ()):
+                    if unique_hash not in shard:
+                        shard.add(unique_hash)
+                        keep.append(i)
+        for keep in kept:
+            keep.sort()
+        return kept
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the process pool for deduplication, None on a single CPU or if disabled."""
+    global _pool
+    workers = settings.dedup_workers or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, as forking a process running the fetch engine threads is unsafe
+            _pool = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, cancel_futures=True)
+    return _pool
+
+
+def scan_chunks(chunks: list[list[dict[str, Any]]]) -> Optional[list[ChunkScan]]:
+    """Scan chunks of proxies in the process pool of ``dedup_workers`` processes.
+
+    Args:
+        chunks: The chunks, of ``dedup_chunk_size`` proxies at most
+
+    Returns:
+        The scans in chunk order, None if there are too few chunks to be
+        worth a pool, the pool is disabled or it broke
+    """
+    pool = _get_pool() if len(chunks) >= 2 else None
+    if pool is None:
+        return None
+    try:
+        return list(pool.map(scan_chunk, chunks))
+    except BrokenProcessPool:
+        global _pool
+        with _pool_lock:
+            _pool = None
+        return None
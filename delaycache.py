@@ -0,0 +1,105 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from loguru import logger
+
+from config import settings
+from fingerprint import fingerprint
+from model import ProxyDelayItem
+from nodestore import NodeStore, get_node_store
+
+
+@dataclass
+class DelayCache:
+    """Delay test results of recent runs, so recently tested nodes skip mihomo.
+
+    Results are kept in the node store per node fingerprint and delay test
+    URL, alive ones for ``alive_ttl_hours`` and dead ones for
+    ``dead_ttl_hours``, counted from the test. Only useful when runs are
+    closer together than the TTLs, so ``delay_cache`` is off by default.
+    """
+
+    store: NodeStore
+    url: str
+    alive_ttl_hours: float = 6
+    dead_ttl_hours: float = 2
+    hits: int = 0
+    misses: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def lookup(
+        self, nodes: list[dict[str, Any]]
+    ) -> tuple[dict[str, ProxyDelayItem], list[dict[str, Any]]]:
+        """Split nodes into those with an unexpired result and those to test.
+
+        Args:
+            nodes: The Clash proxies
+
+        Returns:
+            The cached results by node name, renamed to the name of this
+            run, and the nodes to test
+        """
+        fingerprints = [fingerprint(n) for n in nodes]
+        found = self.store.delay_results(fingerprints, self.url)
+        cached: dict[str, ProxyDelayItem] = {}
+        missing: list[dict[str, Any]] = []
+        for node, fp in zip(nodes, fingerprints):
+            result = found.get(fp)
+            try:
+                item = None if result is None else ProxyDelayItem.model_validate_json(result)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable delay result of {node['name']}: {e}")
+                item = None
+            if item is None:
+                missing.append(node)
+            else:
+                cached[node["name"]] = item.model_copy(update={"name": node["name"]})
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(missing)
+        return cached, missing
+
+    def put(self, results: Iterable[tuple[dict[str, Any], ProxyDelayItem]]) -> None:
+        """Store the fresh delay results of tested nodes."""
+        now = time.time()
+        rows = [
+            (
+                fingerprint(node),
+                self.url,
+                now + (self.alive_ttl_hours if item.alive else self.dead_ttl_hours) * 3600,
+                item.model_dump_json(),
+            )
+            for node, item in results
+        ]
+        self.store.put_delay_results(rows)
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"Delay cache: {self.hits}/{self.hits + self.misses} nodes "
+            f"skipped mihomo with a recent result"
+        )
+
+
+_delay_cache: Optional[DelayCache] = None
+_delay_cache_lock = threading.Lock()
+
+
+def get_delay_cache() -> Optional[DelayCache]:
+    """Get the process-wide delay cache, or None if it or the node store is disabled."""
+    global _delay_cache
+    if not settings.delay_cache:
+        return None
+    store = get_node_store()
+    if store is None:
+        return None
+    with _delay_cache_lock:
+        if _delay_cache is None:
+            _delay_cache = DelayCache(
+                store,
+                settings.delay_url_test,
+                alive_ttl_hours=settings.delay_cache_alive_ttl_hours,
+                dead_ttl_hours=settings.delay_cache_dead_ttl_hours,
+            )
+    return _delay_cache
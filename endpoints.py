@@ -0,0 +1,118 @@
+from typing import Any, Container, Optional
+
+from loguru import logger
+
+from config import settings
+from hostindex import parse_ip
+
+
+class EndpointRole:
+    REPRESENTATIVE = "representative"  # First node of its endpoint, tested first
+    SIBLING = "sibling"  # Tested only if the representative is alive
+    SKIPPED = "skipped"  # Over a quota, not tested
+
+
+def _name(value: Any) -> str:
+    return str(value or "").strip().lower().rstrip(".")
+
+
+def endpoint_key(proxy: dict[str, Any]) -> tuple[str, str, str, str]:
+    """Get the ``(host, port, tls name, ws host)`` a proxy connects to.
+
+    Domains are lowercased without the trailing dot and IP literals are
+    written in their canonical form, so ``[::1]`` and ``0:0::1`` are the
+    same host. Hosts are not resolved, and the TLS server name and the ws
+    Host header are part of the key: nodes fronted by one CDN address are
+    told apart by them, as each of them reaches a different backend.
+    """
+    host = _name(proxy.get("server"))
+    address = parse_ip(host)
+    if address is not None:
+        host = str(address)
+    port = str(proxy.get("port", "")).strip()
+    tls_name = _name(proxy.get("servername") or proxy.get("sni"))
+    headers = (proxy.get("ws-opts") or {}).get("headers") or {}
+    ws_host = _name(headers.get("Host") or headers.get("host"))
+    return host, port, tls_name, ws_host
+
+
+class EndpointIndex:
+    """Groups nodes by endpoint to test one node per endpoint first.
+
+    Many nodes differ only in name, credentials or transport while sharing
+    an endpoint, see :func:`endpoint_key`, and when that endpoint is dead
+    each of them costs a delay test timeout. The first node added per
+    endpoint represents it; the others are tested only once the
+    representative turned out alive.
+    Nodes over ``endpoint_quota`` per endpoint or ``endpoint_host_quota``
+    per host, 0 for no limit, are not tested at all.
+    """
+
+    def __init__(self, endpoint_quota: int = 0, host_quota: int = 0) -> None:
+        self.endpoint_quota = endpoint_quota
+        self.host_quota = host_quota
+        self.groups: dict[tuple[str, str, str, str], list[dict[str, Any]]] = {}
+        self.hosts: dict[str, int] = {}  # Nodes admitted per host
+        self.skipped = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["EndpointIndex"]:
+        """Get an empty index, None if ``endpoint_index`` is disabled."""
+        if not settings.endpoint_index:
+            return None
+        return cls(settings.endpoint_quota, settings.endpoint_host_quota)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def add(self, proxy: dict[str, Any]) -> str:
+        """Add a node, in priority order.
+
+        Args:
+            proxy: The Clash proxy
+
+        Returns:
+            Its :class:`EndpointRole`
+        """
+        key = endpoint_key(proxy)
+        group = self.groups.get(key)
+        admitted = self.hosts.get(key[0], 0)
+        if (
+            (self.host_quota and admitted >= self.host_quota)
+            or (self.endpoint_quota and group is not None and len(group) >= self.endpoint_quota)
+        ):
+            self.skipped += 1
+            return EndpointRole.SKIPPED
+        self.hosts[key[0]] = admitted + 1
+        if group is None:
+            self.groups[key] = [proxy]
+            return EndpointRole.REPRESENTATIVE
+        group.append(proxy)
+        return EndpointRole.SIBLING
+
+    def add_all(self, proxies: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Add nodes, see :meth:`add`.
+
+        Returns:
+            The representatives among them
+        """
+        return [p for p in proxies if self.add(p) == EndpointRole.REPRESENTATIVE]
+
+    def representatives(self) -> list[dict[str, Any]]:
+        return [group[0] for group in self.groups.values()]
+
+    def siblings(self, alive: Container[str]) -> list[dict[str, Any]]:
+        """Get the siblings of the representatives whose names are alive."""
+        return [
+            proxy
+            for group in self.groups.values()
+            if group[0]["name"] in alive
+            for proxy in group[1:]
+        ]
+
+    def log_stats(self) -> None:
+        nodes = sum(len(group) for group in self.groups.values())
+        logger.info(
+            f"Endpoint index: {nodes} nodes on {len(self.groups)} endpoints of "
+            f"{len(self.hosts)} hosts, {self.skipped} over quota"
+        )
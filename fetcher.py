@@ -0,0 +1,404 @@
+import asyncio
+import atexit
+import codecs
+import contextlib
+import datetime
+import pathlib
+import ssl
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Coroutine, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from archive import FetchArchive, FetchMode, open_archive
+from config import settings
+from health import RetryBudget, backoff_delay
+from httpcache import HttpCache
+from utils import extra_headers
+
+T = TypeVar("T")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _is_ssl_error(e: BaseException) -> bool:
+    """Walk the exception chain looking for an SSL failure."""
+    while e is not None:
+        if isinstance(e, ssl.SSLError):
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+@dataclass
+class Transfer:
+    """Outcome of one request, filled in while its body streams."""
+
+    status: int = 0  # Final HTTP status, 0 if no response was received
+    received: int = 0  # Body bytes read so far
+    complete: bool = False  # The whole body was read
+    truncated: bool = False  # Reading stopped at the byte cap
+    cached: bool = False  # The body came from the HTTP cache
+    etag: str = ""
+    last_modified: str = ""
+
+
+class FetchEngine:
+    """Shared asyncio HTTP client for fetching subscription sources.
+
+    One ``httpx.AsyncClient`` keeps keep-alive (and HTTP/2 when ``h2`` is
+    installed) connections pooled per host. Requests are limited by a global
+    in-flight semaphore and a per-host semaphore, so a single host such as
+    raw.githubusercontent.com cannot starve the others.
+
+    The engine owns a background event loop, so synchronous callers can use
+    :meth:`run` while asynchronous code awaits :meth:`fetch` directly on
+    that loop.
+
+    Retries back off exponentially with jitter and draw from a
+    :class:`health.RetryBudget` shared by the whole run.
+
+    Bodies are streamed and cut at a byte cap, and :meth:`iter_lines` lets
+    callers stop reading a body as soon as they have what they need.
+
+    With a :class:`httpcache.HttpCache` attached, requests are sent as
+    conditional GETs and a ``304 Not Modified`` reuses the cached body.
+    With an :class:`archive.FetchArchive` attached, every result is recorded
+    to it, or served from it without touching the network when replaying.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = settings.fetch_max_connections,
+        max_per_host: int = settings.fetch_max_per_host,
+        http2: bool = settings.fetch_http2,
+        cache: Optional[HttpCache] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        archive: Optional[FetchArchive] = None,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.http2 = http2 and _http2_available()
+        self.cache = cache
+        self.archive = archive
+        self.retry_budget = retry_budget or RetryBudget(settings.fetch_retry_budget)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop all engine coroutines run on, started on demand."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="fetch-engine",
+                    daemon=True,
+                )
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the engine loop and block until it finishes.
+
+        Args:
+            coro: The coroutine to run
+
+        Returns:
+            The coroutine result
+
+        Raises:
+            RuntimeError: If called from the engine loop itself
+        """
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("FetchEngine.run() called from the engine loop, await instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                follow_redirects=True,
+                timeout=settings.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._global = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return self._hosts[host]
+
+    def _cap(self, max_bytes: Optional[int]) -> int:
+        return settings.max_body_bytes if max_bytes is None else max_bytes
+
+    async def fetch(self, url: str, max_retries: int = 3, max_bytes: Optional[int] = None) -> str:
+        """Fetch a URL with retries and error handling.
+
+        Args:
+            url: The URL (or local file path) to request
+            max_retries: Maximum number of retry attempts
+            max_bytes: Byte cap of the body, ``max_body_bytes`` if None, 0 for no cap.
+                A longer body is cut back to its last complete line.
+
+        Returns:
+            The response text or empty string if all attempts fail
+        """
+        if self.replaying:
+            return await asyncio.to_thread(self.archive.replay, url)
+
+        transfer = Transfer()
+        chunks = self._stream(url, max_retries, self._cap(max_bytes), transfer, buffered=True)
+        body = "".join([text async for text in chunks])
+        if transfer.truncated and body.rfind("\n") > 0:
+            body = body[: body.rfind("\n")]
+        body = body.strip().replace("\ufeff", "")
+        await self._finish(url, transfer, body)
+        return body
+
+    async def iter_lines(
+        self, url: str, max_retries: int = 3, max_bytes: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream the lines of a URL as they arrive.
+
+        Closing the iterator early (use ``contextlib.aclosing``) stops the
+        download. Requests are only retried until the first bytes arrive, and
+        only a fully read body is stored in the HTTP cache.
+
+        Args:
+            url: The URL (or local file path) to request
+            max_retries: Maximum number of retry attempts
+            max_bytes: Byte cap of the body, ``max_body_bytes`` if None, 0 for no cap.
+                The line cut by the cap is dropped.
+
+        Yields:
+            Lines without their line endings
+        """
+        if self.replaying:
+            body = await asyncio.to_thread(self.archive.replay, url)
+            for line in body.splitlines():
+                yield line
+            return
+
+        transfer = Transfer()
+        consumed: list[str] = []
+        pending = ""
+        try:
+            async with contextlib.aclosing(
+                self._stream(url, max_retries, self._cap(max_bytes), transfer, buffered=False)
+            ) as chunks:
+                async for text in chunks:
+                    lines = (pending + text).split("\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        line = line.rstrip("\r").replace("\ufeff", "")
+                        consumed.append(line)
+                        yield line
+            if pending and not transfer.truncated:
+                pending = pending.rstrip("\r").replace("\ufeff", "")
+                consumed.append(pending)
+                yield pending
+        finally:
+            await self._finish(url, transfer, "\n".join(consumed).strip())
+
+    async def _finish(self, url: str, transfer: "Transfer", body: str) -> None:
+        """Cache a complete fresh body and record the outcome to the archive."""
+        if (
+            self.cache is not None
+            and transfer.complete
+            and not transfer.cached
+            and not transfer.truncated
+            and (transfer.status // 100) == 2
+            and body
+        ):
+            await asyncio.to_thread(
+                self.cache.store, url, body, transfer.etag, transfer.last_modified
+            )
+        if self.archive is not None:
+            await asyncio.to_thread(self.archive.record, url, transfer.status, body)
+
+    async def _read_body(
+        self, r: httpx.Response, max_bytes: int, transfer: "Transfer"
+    ) -> AsyncIterator[str]:
+        """Decode a response body chunk by chunk, stopping at the byte cap."""
+        decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+        async for data in r.aiter_bytes():
+            if max_bytes and transfer.received + len(data) > max_bytes:
+                data = data[: max_bytes - transfer.received]
+                transfer.truncated = True
+            transfer.received += len(data)
+            text = decoder.decode(data)
+            if text:
+                yield text
+            if transfer.truncated:
+                return
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+        transfer.complete = True
+
+    async def _stream(
+        self,
+        url: str,
+        max_retries: int,
+        max_bytes: int,
+        transfer: "Transfer",
+        buffered: bool,
+    ) -> AsyncIterator[str]:
+        """Request a URL and yield its body as decoded text chunks.
+
+        Args:
+            url: The URL (or local file path) to request
+            max_retries: Maximum number of retry attempts
+            max_bytes: Byte cap of the body, 0 for no cap
+            transfer: Filled in with the outcome of the request
+            buffered: Read the whole body before yielding it, so failures
+                while reading are retried too
+        """
+        # Check if URL is a local file
+        if pathlib.Path(url).exists():
+            try:
+                text = await asyncio.to_thread(pathlib.Path(url).read_text, encoding="utf-8")
+            except Exception as e:
+                logger.warning(f"Cannot read local file {url}: {e}")
+                return
+            transfer.status = 200
+            transfer.complete = True
+            yield text
+            return
+
+        client = self._get_client()
+        host_semaphore = self._host_semaphore(url)
+
+        if self.cache is not None:
+            self.cache.count_request()
+
+        # Make request with retries
+        last_exception = None
+        for attempt in range(max_retries):
+            chunks: list[str] = []
+            try:
+                headers = extra_headers() or {}
+                if self.cache is not None:
+                    headers.update(self.cache.conditional_headers(url))
+                async with host_semaphore, self._global:
+                    async with client.stream("GET", url, headers=headers) as r:
+                        transfer.status = r.status_code
+                        if r.status_code == 304 and self.cache is not None:
+                            body = await asyncio.to_thread(self.cache.load, url)
+                            if body is not None:
+                                transfer.cached = transfer.complete = True
+                                chunks.append(body)
+                        elif (r.status_code // 100) == 2:
+                            transfer.etag = r.headers.get("ETag", "")
+                            transfer.last_modified = r.headers.get("Last-Modified", "")
+                            async for text in self._read_body(r, max_bytes, transfer):
+                                if buffered:
+                                    chunks.append(text)
+                                else:
+                                    yield text
+                if transfer.complete or transfer.truncated:
+                    if transfer.truncated:
+                        logger.warning(f"Body of {url} exceeds {max_bytes} bytes, truncated")
+                    for text in chunks:
+                        yield text
+                    return
+
+                # Handle non-2xx status codes
+                logger.warning(f"Request to {url} failed with status {r.status_code}")
+                if r.status_code == 404:
+                    break  # No point retrying 404
+
+            except httpx.TimeoutException as e:
+                last_exception = e
+                logger.warning(f"Request to {url} timed out (attempt {attempt + 1}/{max_retries})")
+            except Exception as e:
+                last_exception = e
+                if _is_ssl_error(e):
+                    logger.warning(f"SSL error when requesting {url}: {e}")
+                    break  # Don't retry SSL errors
+                logger.warning(f"Error requesting {url} (attempt {attempt + 1}/{max_retries}): {e}")
+
+            if not buffered and transfer.received:
+                break  # Lines already handed out cannot be taken back
+            transfer.received = 0
+            if attempt < max_retries - 1:
+                if not self.retry_budget.take():
+                    logger.warning(f"Retry budget of this run is spent, giving up {url}")
+                    break
+                await asyncio.sleep(
+                    backoff_delay(attempt, settings.fetch_backoff_base, settings.fetch_backoff_cap)
+                )
+
+        if last_exception:
+            logger.warning(f"All attempts failed for {url}: {last_exception}")
+
+    @property
+    def replaying(self) -> bool:
+        """Whether bodies are served from an archive instead of the network."""
+        return self.archive is not None and self.archive.mode == FetchMode.REPLAY
+
+    def now(self) -> datetime.datetime:
+        """Get the current time, pinned to the recording when replaying an archive."""
+        return self.archive.now() if self.archive is not None else datetime.datetime.now()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self) -> None:
+        """Close pooled connections and stop the background loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+        self._hosts.clear()
+
+
+_engine: Optional[FetchEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> FetchEngine:
+    """Get the process-wide fetch engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            cache = None
+            if settings.http_cache:
+                cache = HttpCache(
+                    f"{settings.cache_dir}/http",
+                    max_age_days=settings.http_cache_max_age_days,
+                )
+            archive = open_archive(settings.fetch_mode, settings.fetch_archive)
+            if archive is not None and archive.mode == FetchMode.REPLAY:
+                cache = None
+            _engine = FetchEngine(cache=cache, archive=archive)
+            atexit.register(_engine.close)
+    return _engine
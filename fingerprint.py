@@ -0,0 +1,99 @@
+import hashlib
+from typing import Any, Optional
+
+# Bump when fingerprint_key changes which proxies count as the same
+FINGERPRINT_VERSION = "1"
+
+FINGERPRINT_SIZE = 16  # Digest bytes, twice as many hex characters
+
+# Fields telling apart two proxies of a type on the same server and port,
+# besides the credentials every type shares
+_IDENTITY = {
+    "vless": ("sni",),
+    "trojan": ("sni",),
+    "ss": ("plugin-opts",),
+    "ssr": ("obfs-param",),
+    "hysteria": ("auth_str",),
+    "hysteria2": ("sni", "obfs-password"),
+    "tuic": ("token",),
+    "wireguard": ("private-key",),
+    "http": ("username",),
+    "socks5": ("username",),
+}
+_CREDENTIALS = ("alpn", "password", "uuid")
+# Types whose network and its options are part of the identity
+_NETWORK_TYPES = frozenset(("vmess", "vless", "trojan"))
+_TRANSPORT_OPTS = {"ws": "ws-opts", "h2": "h2-opts", "grpc": "grpc-opts"}
+
+
+def _normalize(value: Any) -> Any:
+    """Turn a field value into nested tuples of strings.
+
+    Missing and empty values are all None, mappings are sorted by key and
+    scalars are compared as text, so ``443`` and ``"443"`` are the same.
+    """
+    if value is None or value == "" or value == [] or value == {}:
+        return None
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        items = tuple(v for v in map(_normalize, value) if v is not None)
+        return items or None
+    return str(value)
+
+
+def fingerprint_key(proxy: dict[str, Any]) -> tuple:
+    """Build the normalized tuple identifying a proxy, see :func:`fingerprint`."""
+    type = str(proxy["type"])
+    server = str(proxy["server"]).strip().lower().rstrip(".")
+    network: Optional[str] = None
+    transport = None
+    if type in _NETWORK_TYPES:
+        network = str(proxy.get("network") or "tcp")
+        if network in _TRANSPORT_OPTS:
+            transport = _normalize(proxy.get(_TRANSPORT_OPTS[network]))
+        elif network == "tcp":
+            network = None  # The default, whether spelled out or not
+    return (
+        type,
+        server,
+        _normalize(proxy.get("port")),
+        tuple(_normalize(proxy.get(f)) for f in _IDENTITY.get(type, ())),
+        network,
+        transport,
+        tuple(_normalize(proxy.get(f)) for f in _CREDENTIALS),
+    )
+
+
+def _encode(value: Any, out: bytearray) -> None:
+    # Length-prefixed, so no two distinct keys share an encoding
+    if value is None:
+        out += b"N"
+    elif isinstance(value, tuple):
+        out += b"L%d:" % len(value)
+        for item in value:
+            _encode(item, out)
+    else:
+        data = value.encode("utf-8", "surrogatepass")
+        out += b"S%d:" % len(data)
+        out += data
+
+
+def fingerprint(proxy: dict[str, Any]) -> str:
+    """Get the canonical fingerprint of a proxy.
+
+    Two proxies have the same fingerprint when they connect the same way:
+    same type, server, port, credentials and transport, whatever their
+    names, key order or the spelling of empty options. Unlike ``hash()``,
+    the fingerprint is the same in every process and every run, so it can
+    be stored, compared across runs and computed in worker processes.
+
+    Args:
+        proxy: The Clash proxy
+
+    Returns:
+        A blake2b digest of :func:`fingerprint_key`, as hex
+    """
+    out = bytearray(FINGERPRINT_VERSION.encode("ascii"))
+    _encode(fingerprint_key(proxy), out)
+    return hashlib.blake2b(out, digest_size=FINGERPRINT_SIZE).hexdigest()
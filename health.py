@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import NamedTuple, Optional
+
+from loguru import logger
+
+from config import settings
+
+
+@dataclass
+class SourceHealth:
+    """Fetch history of one source URL."""
+
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency: float = 0.0  # Exponentially weighted seconds per fetch
+    size: int = 0  # Bytes of the last body
+    proxies: int = 0  # Proxies parsed from the last body
+    last_attempt: float = 0.0
+    last_success: float = 0.0
+    open_until: float = 0.0  # Circuit stays open until then
+
+    @property
+    def score(self) -> float:
+        """Laplace-smoothed success ratio, higher is healthier."""
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+
+class FetchOutcome(NamedTuple):
+    """Outcome of fetching a source once."""
+
+    ok: bool
+    latency: float
+    size: int
+    proxies: int
+
+
+class CircuitState:
+    CLOSED = "closed"  # Fetch normally
+    HALF_OPEN = "half-open"  # Probe with a single attempt
+    OPEN = "open"  # Skip this run
+
+
+@dataclass
+class RetryBudget:
+    """Retries the whole run may spend, shared by all requests."""
+
+    total: int
+    used: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def take(self) -> bool:
+        """Spend one retry.
+
+        Returns:
+            Whether the budget allowed it
+        """
+        with self._lock:
+            if self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Get the "full jitter" exponential backoff before a retry.
+
+    Args:
+        attempt: Zero-based number of the attempt that just failed
+        base: Delay scale in seconds
+        cap: Upper bound of the delay in seconds
+
+    Returns:
+        Seconds to sleep
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+@dataclass
+class HealthRegistry:
+    """Persisted per-source health driving circuit breaking.
+
+    A source failing ``failure_threshold`` runs in a row gets its circuit
+    opened for ``cooldown_hours``, doubling with every further failure up to
+    ``max_cooldown_hours``. While open the source is skipped; once the
+    cooldown is over it is probed with a single attempt, and one success
+    closes the circuit again. A URL gets one outcome per run however many
+    times it is listed, applied when the registry is saved.
+    """
+
+    path: str
+    failure_threshold: int = 3
+    cooldown_hours: float = 24
+    max_cooldown_hours: float = 24 * 7
+    forget_days: float = 30
+    entries: dict[str, SourceHealth] = field(default_factory=dict)
+    outcomes: dict[str, FetchOutcome] = field(default_factory=dict)  # This run's
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = {
+                    url: SourceHealth(**entry) for url, entry in json.load(f).items()
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Discarding unreadable source health {self.path}: {e}")
+
+    def get(self, url: str) -> SourceHealth:
+        with self._lock:
+            if url not in self.entries:
+                self.entries[url] = SourceHealth()
+            return self.entries[url]
+
+    def score(self, url: str) -> float:
+        """Get the success score of a URL without registering it."""
+        with self._lock:
+            health = self.entries.get(url)
+        return health.score if health else SourceHealth().score
+
+    def state(self, url: str) -> str:
+        """Get the circuit state of a source."""
+        health = self.get(url)
+        if health.consecutive_failures < self.failure_threshold:
+            return CircuitState.CLOSED
+        if time.time() < health.open_until:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def record(
+        self,
+        url: str,
+        ok: bool,
+        latency: float,
+        size: int = 0,
+        proxies: int = 0,
+    ) -> None:
+        """Record the outcome of fetching a source in this run.
+
+        A URL fetched several times in a run, e.g. listed more than once,
+        counts as one run: succeeded if any of its fetches did.
+
+        Args:
+            url: The source URL
+            ok: Whether the source yielded proxies
+            latency: Seconds the fetch took
+            size: Bytes of the fetched body
+            proxies: Proxies parsed from the body
+        """
+        with self._lock:
+            previous = self.outcomes.get(url)
+            if previous is None or (ok and not previous.ok):
+                self.outcomes[url] = FetchOutcome(ok, latency, size, proxies)
+
+    def _apply(self, url: str, outcome: FetchOutcome, now: float) -> None:
+        health = self.entries.setdefault(url, SourceHealth())
+        health.last_attempt = now
+        latency = outcome.latency
+        health.latency = latency if not health.latency else 0.7 * health.latency + 0.3 * latency
+        health.size = outcome.size
+        health.proxies = outcome.proxies
+        if outcome.ok:
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.last_success = now
+            health.open_until = 0.0
+            return
+
+        health.failures += 1
+        health.consecutive_failures += 1
+        over = health.consecutive_failures - self.failure_threshold
+        if over >= 0:
+            hours = min(self.max_cooldown_hours, self.cooldown_hours * 2**over)
+            health.open_until = now + hours * 3600
+            logger.info(
+                f"Source {url} failed {health.consecutive_failures} times in a row, "
+                f"skipping it for {hours:.0f}h"
+            )
+
+    def save(self) -> None:
+        """Apply the outcomes of this run and write the registry back.
+
+        URLs not tried for ``forget_days`` are forgotten.
+        """
+        now = time.time()
+        expire = now - self.forget_days * 86400
+        with self._lock:
+            for url, outcome in self.outcomes.items():
+                self._apply(url, outcome, now)
+            self.outcomes.clear()
+            data = {
+                url: asdict(h) for url, h in self.entries.items() if h.last_attempt > expire
+            }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+_registry: Optional[HealthRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_health_registry() -> HealthRegistry:
+    """Get the process-wide source health registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = HealthRegistry(
+                f"{settings.cache_dir}/health.json",
+                failure_threshold=settings.health_failure_threshold,
+                cooldown_hours=settings.health_cooldown_hours,
+                max_cooldown_hours=settings.health_max_cooldown_hours,
+            )
+    return _registry
@@ -0,0 +1,176 @@
+import ipaddress
+from typing import Iterable, Optional, Union
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+# Marks a node where a domain ends; never a label since labels are split on "."
+_HERE = "."
+
+
+def _labels(domain: str) -> list[str]:
+    labels = domain.strip().lower().rstrip(".").split(".")
+    labels.reverse()
+    return labels
+
+
+class DomainTree:
+    """
+    A Trie tree for fast domain lookup.
+
+    Nodes are plain dicts keyed by label, from the TLD down. A domain
+    covers all of its subdomains, so the subtree under an inserted domain
+    is dropped as redundant.
+    """
+
+    def __init__(self, domains: Iterable[str] = ()) -> None:
+        """
+        Initialize DomainTree.
+        """
+        self.root: dict = {}
+        for domain in domains:
+            self.insert(domain)
+
+    def insert(self, domain: str) -> None:
+        """
+        Insert a domain.
+        """
+        node = self.root
+        for label in _labels(domain):
+            if _HERE in node:
+                return  # A parent domain already covers it
+            node = node.setdefault(label, {})
+        node.clear()
+        node[_HERE] = True
+
+    def remove(self, domain: str) -> None:
+        """
+        Remove a domain, its subdomains and the parent domains covering it.
+        """
+        node = self.root
+        for label in _labels(domain):
+            node.pop(_HERE, None)
+            node = node.get(label)
+            if node is None:
+                return
+        node.clear()
+
+    def match(self, domain: str) -> bool:
+        """
+        Check whether a domain or one of its parent domains was inserted.
+        """
+        node = self.root
+        for label in _labels(domain):
+            node = node.get(label)
+            if node is None:
+                return False
+            if _HERE in node:
+                return True
+        return False
+
+    __contains__ = match
+
+    def get(self) -> list[str]:
+        """
+        Get all domains.
+        """
+        all_domain: list[str] = []
+        stack = [(self.root, "")]
+        while stack:
+            node, suffix = stack.pop()
+            for label, child in node.items():
+                if label == _HERE:
+                    continue
+                name = f"{label}.{suffix}" if suffix else label
+                if _HERE in child:
+                    all_domain.append(name)
+                else:
+                    stack.append((child, name))
+        return all_domain
+
+
+class CidrIndex:
+    """IP prefix index answering whether an address is in any of its networks.
+
+    Networks are kept as sets of network numbers per version and prefix
+    length, so a lookup costs one set probe per distinct prefix length.
+    """
+
+    def __init__(self, networks: Iterable[str] = ()) -> None:
+        self.prefixes: dict[int, dict[int, set[int]]] = {4: {}, 6: {}}
+        for network in networks:
+            self.insert(network)
+
+    def insert(self, network: str) -> None:
+        """Add an address or a network such as ``10.0.0.0/8``.
+
+        Raises:
+            ValueError: If it is neither
+        """
+        net = ipaddress.ip_network(network.strip(), strict=False)
+        shift = net.max_prefixlen - net.prefixlen
+        self.prefixes[net.version].setdefault(net.prefixlen, set()).add(
+            int(net.network_address) >> shift
+        )
+
+    def match(self, address: IPAddress) -> bool:
+        """Check whether an address is in one of the networks."""
+        value = int(address)
+        bits = address.max_prefixlen
+        for prefixlen, nets in self.prefixes[address.version].items():
+            if value >> (bits - prefixlen) in nets:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return sum(len(nets) for by_len in self.prefixes.values() for nets in by_len.values())
+
+
+def parse_ip(host: str) -> Optional[IPAddress]:
+    """Get the address of an IP literal host, None for a domain."""
+    host = host.strip()
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    # Domains only rarely end in a digit; skip the exception for the rest
+    if not host or not (host[-1].isdigit() or ":" in host):
+        return None
+    try:
+        return ipaddress.ip_address(host)
+    except ValueError:
+        return None
+
+
+class HostIndex:
+    """Blocklist of domains and IP networks matched with one lookup per host.
+
+    Domains match themselves and their subdomains, IP entries match the
+    addresses in their network rather than as string suffixes.
+    """
+
+    def __init__(self, entries: Iterable[str] = ()) -> None:
+        self.domains = DomainTree()
+        self.networks = CidrIndex()
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: str) -> None:
+        """Add a domain, an IP address or a CIDR network.
+
+        Raises:
+            ValueError: If an entry with a ``/`` is not a valid network
+        """
+        entry = str(entry).strip()
+        if not entry:
+            return
+        if "/" in entry or parse_ip(entry) is not None:
+            self.networks.insert(entry)
+        else:
+            self.domains.insert(entry)
+
+    def match(self, host: str) -> bool:
+        """Check whether a proxy server is blocked."""
+        address = parse_ip(host)
+        if address is not None:
+            return self.networks.match(address)
+        return self.domains.match(host)
+
+    __contains__ = match
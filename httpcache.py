@@ -0,0 +1,193 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from loguru import logger
+
+from utils import write_gzip
+
+
+@dataclass
+class CacheEntry:
+    """Validators and body location of one cached URL."""
+
+    file: str
+    etag: str = ""
+    last_modified: str = ""
+    size: int = 0
+    stored: float = 0.0
+    used: float = 0.0
+
+
+@dataclass
+class CacheStats:
+    """Counters of one run, reported after fetching."""
+
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    bytes_saved: int = 0
+    bytes_downloaded: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+
+@dataclass
+class HttpCache:
+    """On-disk conditional-GET cache for subscription bodies.
+
+    Each URL keeps its ``ETag``/``Last-Modified`` validators in ``index.json``
+    and its body gzip-compressed next to it, so an unchanged source costs one
+    ``304 Not Modified`` round trip instead of a full download.
+    """
+
+    path: str
+    max_age_days: int = 7
+    entries: dict[str, CacheEntry] = field(default_factory=dict)
+    stats: CacheStats = field(default_factory=CacheStats)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        """Load the index of a previous run if there is one."""
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self.entries = {
+                    url: CacheEntry(**entry) for url, entry in json.load(f).items()
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Discarding unreadable HTTP cache index {self._index_path}: {e}")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+
+    def count_request(self) -> None:
+        """Count a fetch of a URL, once however many attempts it takes."""
+        with self._lock:
+            self.stats.requests += 1
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """Get the ``If-None-Match``/``If-Modified-Since`` headers for a URL.
+
+        Args:
+            url: The URL about to be requested
+
+        Returns:
+            The validator headers, empty if the URL is not cached
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+        headers = {}
+        if entry is None or not os.path.exists(os.path.join(self.path, entry.file)):
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def load(self, url: str) -> Optional[str]:
+        """Read the cached body of a URL answered with 304.
+
+        Args:
+            url: The requested URL
+
+        Returns:
+            The cached body, or None if it is missing or unreadable
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+        if entry is None:
+            return None
+        file = os.path.join(self.path, entry.file)
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                body = f.read()
+        except Exception as e:
+            # A corrupt entry is a miss, the URL is downloaded again without validators
+            logger.warning(f"Discarding unreadable cached body of {url}: {e}")
+            with self._lock:
+                if self.entries.get(url) is entry:
+                    del self.entries[url]
+            with contextlib.suppress(OSError):
+                os.remove(file)
+            return None
+        with self._lock:
+            entry.used = time.time()
+            self.stats.hits += 1
+            self.stats.bytes_saved += entry.size
+        return body
+
+    def store(self, url: str, body: str, etag: str = "", last_modified: str = "") -> None:
+        """Store a freshly downloaded body with its validators.
+
+        Args:
+            url: The requested URL
+            body: The response body
+            etag: The ``ETag`` response header
+            last_modified: The ``Last-Modified`` response header
+        """
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.bytes_downloaded += size
+        if not etag and not last_modified:
+            return  # Nothing to revalidate with next time
+
+        file = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".txt.gz"
+        try:
+            write_gzip(os.path.join(self.path, file), body)
+        except Exception as e:
+            logger.warning(f"Cannot cache body of {url}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            self.entries[url] = CacheEntry(file, etag, last_modified, size, now, now)
+            self.stats.stores += 1
+
+    def save(self) -> None:
+        """Drop stale entries and write the index back to disk."""
+        expire = time.time() - self.max_age_days * 86400
+        with self._lock:
+            for url, entry in list(self.entries.items()):
+                if entry.used < expire:
+                    del self.entries[url]
+            index = {url: asdict(entry) for url, entry in self.entries.items()}
+
+        live = {entry["file"] for entry in index.values()}
+        for file in os.listdir(self.path):
+            # Also temporary files of writes cut short
+            if (file.endswith(".txt.gz") and file not in live) or file.endswith(".tmp"):
+                os.remove(os.path.join(self.path, file))
+
+        with open(self._index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+    def size(self) -> int:
+        """Get the on-disk size of the cached bodies in bytes."""
+        return sum(
+            os.path.getsize(os.path.join(self.path, f))
+            for f in os.listdir(self.path)
+            if f.endswith(".txt.gz")
+        )
+
+    def log_stats(self) -> None:
+        s = self.stats
+        logger.info(
+            f"HTTP cache: {s.hits}/{s.requests} hits ({s.hit_rate:.1%}), "
+            f"{s.stores} stored, {s.bytes_saved / 1024:.0f} KiB saved, "
+            f"{s.bytes_downloaded / 1024:.0f} KiB downloaded, "
+            f"{len(self.entries)} entries using {self.size() / 1024:.0f} KiB"
+        )
@@ -0,0 +1,61 @@
+import html
+import re
+from typing import Iterator
+from urllib.parse import unquote
+
+# Longest first so "ssr" is tried before "ss" and "hysteria2" before "hysteria"
+SCHEMES = (
+    "wireguard",
+    "hysteria2",
+    "hysteria",
+    "socks5",
+    "socks",
+    "anytls",
+    "trojan",
+    "vmess",
+    "vless",
+    "tuic",
+    "hy2",
+    "ssr",
+    "ss",
+    "wg",
+)
+
+_SCHEME = "(?:" + "|".join(SCHEMES) + ")://"
+# A link runs until whitespace, markup or quotes
+_LINK = re.compile(r"(?<![A-Za-z0-9])" + _SCHEME + r"[^\s<>\"'`]+")
+# ...or until the next link glued to it
+_NEXT = re.compile(r"(?<=[^A-Za-z0-9])(?=" + _SCHEME + ")")
+
+
+def iter_links(content: str) -> Iterator[str]:
+    """Scan a document for proxy share links in a single pass.
+
+    Works on raw HTML, markdown or plain text alike: entities and percent
+    escapes are decoded once for the whole document, and links end at
+    whitespace, tags, quotes or where the next link starts. Every link is
+    yielded once, in the order of first appearance.
+
+    Args:
+        content: The document
+
+    Yields:
+        The distinct links
+    """
+    if "&" in content:
+        content = html.unescape(content)
+    if "%" in content:
+        content = unquote(content)
+    seen = set()
+    for m in _LINK.finditer(content):
+        link = m.group()
+        links = _NEXT.split(link) if link.count("://") > 1 else (link,)
+        for link in links:
+            if link not in seen:
+                seen.add(link)
+                yield link
+
+
+def find_links(content: str) -> list[str]:
+    """Get the distinct proxy share links of a document, see :func:`iter_links`."""
+    return list(iter_links(content))
@@ -0,0 +1,117 @@
+import re
+import threading
+from typing import Any, Iterable, Mapping
+
+from config import get_snapshot
+
+# Joins names for one regex pass; banned words never contain whitespace
+_SEP = "\n"
+
+
+class NameNormalizer:
+    """Masks banned words in proxy names and canonicalizes region names.
+
+    The banned words are compiled once into a single alternation, longest
+    first, and region display names are mapped back to their codes with a
+    reverse dict instead of a scan of ``region_names``.
+    """
+
+    def __init__(
+        self,
+        banned_words: Iterable[str],
+        region_codes: Mapping[str, str],
+        max_len: int = 30,
+    ) -> None:
+        words = sorted({w for w in banned_words if w}, key=len, reverse=True)
+        self._banned = re.compile("|".join(map(re.escape, words))) if words else None
+        self.region_codes = dict(region_codes)
+        self.max_len = max_len
+
+    @classmethod
+    def from_settings(cls, max_len: int = 30) -> "NameNormalizer":
+        snapshot = get_snapshot()
+        return cls(snapshot.banned_words, snapshot.region_codes, max_len)
+
+    @staticmethod
+    def _mask(m: re.Match) -> str:
+        return "*" * len(m.group())
+
+    def _finish(self, name: str) -> str:
+        if len(name) > self.max_len:
+            name = name[: self.max_len] + "..."
+        return self.region_codes.get(name, name)
+
+    def normalize(self, name: Any) -> str:
+        """Mask the banned words of a name, truncate it and map region names to codes."""
+        name = str(name)
+        if self._banned is not None:
+            name = self._banned.sub(self._mask, name)
+        return self._finish(name)
+
+    def normalize_all(self, names: Iterable[Any]) -> list[str]:
+        """Normalize many names, see :meth:`normalize`.
+
+        The banned words are masked in one regex pass over all the names.
+
+        Args:
+            names: The names
+
+        Returns:
+            The normalized names in the same order
+        """
+        names = [str(n) for n in names]
+        if not names:
+            return names
+        if self._banned is not None:
+            text = _SEP.join(names)
+            if text.count(_SEP) == len(names) - 1:
+                names = self._banned.sub(self._mask, text).split(_SEP)
+            else:  # A name contains the separator
+                names = [self._banned.sub(self._mask, n) for n in names]
+        return [self._finish(n) for n in names]
+
+
+class NameAllocator:
+    """Hands out unique proxy names, numbering repeats ``name #1``, ``name #2``...
+
+    Keeps the next suffix to try per base name, so the n-th repeat of a
+    popular name such as "unnamed" costs O(1) instead of probing every
+    suffix handed out before it. Names that already look suffixed are
+    skipped over like any other taken name.
+    """
+
+    def __init__(self) -> None:
+        self.taken: set[str] = set()
+        self._next: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.taken
+
+    def __len__(self) -> int:
+        return len(self.taken)
+
+    def allocate(self, name: str) -> str:
+        """Reserve a name, or its first free numbered variant if it is taken.
+
+        Args:
+            name: The wanted name
+
+        Returns:
+            The name reserved
+        """
+        with self._lock:
+            if name not in self.taken:
+                self.taken.add(name)
+                return name
+            i = self._next.get(name, 1)
+            while f"{name} #{i}" in self.taken:
+                i += 1
+            self._next[name] = i + 1
+            new_name = f"{name} #{i}"
+            self.taken.add(new_name)
+            return new_name
+
+    def claim(self, proxy: dict[str, Any]) -> None:
+        """Rename a proxy to a unique name."""
+        proxy["name"] = self.allocate(proxy["name"])
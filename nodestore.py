@@ -0,0 +1,273 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from loguru import logger
+
+from config import settings
+from fingerprint import fingerprint
+
+# Bump when the tables change, older stores are then started afresh
+NODE_STORE_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    fingerprint TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    server TEXT NOT NULL,
+    port TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL,  -- Source the node was first seen in
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_tested REAL NOT NULL DEFAULT 0,
+    last_alive REAL NOT NULL DEFAULT 0,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS samples (
+    fingerprint TEXT NOT NULL,
+    run REAL NOT NULL,  -- Start time of the run
+    delay REAL,  -- Average delay in ms, NULL if the node was dead
+    PRIMARY KEY (fingerprint, run)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS delay_results (
+    fingerprint TEXT NOT NULL,
+    url TEXT NOT NULL,  -- The delay test URL
+    expires REAL NOT NULL,
+    result TEXT NOT NULL,  -- The mihomo delay result, as JSON
+    PRIMARY KEY (fingerprint, url)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class NodeHistory:
+    """What earlier runs know about a node."""
+
+    fingerprint: str
+    source: str
+    first_seen: float
+    last_seen: float
+    last_tested: float
+    last_alive: float
+    consecutive_failures: int
+    delays: tuple[Optional[float], ...]  # Latest run first, None when dead
+
+
+class NodeStore:
+    """SQLite database of the nodes of every run, keyed by :func:`fingerprint`.
+
+    Records when a node was first and last seen and in which source it first
+    appeared, plus one delay sample per run it was tested in and its
+    consecutive failures. Writes are batched, one transaction per call.
+    """
+
+    def __init__(self, path: str, max_samples: int = 30, forget_days: float = 30) -> None:
+        self.path = path
+        self.max_samples = max_samples
+        self.forget_days = forget_days
+        self.run = time.time()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            self._conn = self._open()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Discarding unreadable node store {path}: {e}")
+            os.remove(path)
+            self._conn = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        # Shared by the dedup and delay check threads, serialized by _lock
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != NODE_STORE_VERSION:
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS nodes")
+                conn.execute("DROP TABLE IF EXISTS samples")
+                conn.execute("DROP TABLE IF EXISTS delay_results")
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {NODE_STORE_VERSION}")
+        return conn
+
+    def record_seen(self, proxies: Iterable[dict[str, Any]], source: str) -> None:
+        """Upsert the nodes of a source seen in this run.
+
+        Args:
+            proxies: The unique Clash proxies of the source
+            source: The source URL, kept only for nodes seen the first time
+        """
+        rows = [
+            (
+                fingerprint(p),
+                str(p.get("type", "")),
+                str(p.get("server", "")),
+                str(p.get("port", "")),
+                str(p.get("name", "")),
+                source,
+                self.run,
+            )
+            for p in proxies
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO nodes (fingerprint, type, server, port, name, source, first_seen, last_seen)
+                VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?7)
+                ON CONFLICT (fingerprint) DO UPDATE SET
+                    name = excluded.name, last_seen = excluded.last_seen
+                """,
+                rows,
+            )
+
+    def record_delays(self, results: Iterable[tuple[dict[str, Any], Optional[float]]]) -> None:
+        """Record the delay test outcome of nodes in this run.
+
+        Args:
+            results: Pairs of a tested Clash proxy and its average delay in
+                ms, None if it was dead
+        """
+        rows = [(fingerprint(p), self.run, delay) for p, delay in results]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO samples (fingerprint, run, delay) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                """
+                UPDATE nodes SET
+                    last_tested = ?2,
+                    last_alive = CASE WHEN ?3 IS NULL THEN last_alive ELSE ?2 END,
+                    consecutive_failures = CASE WHEN ?3 IS NULL THEN consecutive_failures + 1 ELSE 0 END
+                WHERE fingerprint = ?1 AND last_tested < ?2
+                """,
+                rows,
+            )
+
+    def delay_results(self, fingerprints: Iterable[str], url: str) -> dict[str, str]:
+        """Get the unexpired delay results of nodes for a test URL.
+
+        Args:
+            fingerprints: The node fingerprints
+            url: The delay test URL
+
+        Returns:
+            The JSON results by fingerprint
+        """
+        wanted = list(fingerprints)
+        now = time.time()
+        results: dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(wanted), 500):
+                batch = wanted[i : i + 500]
+                marks = ",".join("?" * len(batch))
+                results.update(
+                    self._conn.execute(
+                        f"""
+                        SELECT fingerprint, result FROM delay_results
+                        WHERE url = ? AND expires > ? AND fingerprint IN ({marks})
+                        """,
+                        (url, now, *batch),
+                    )
+                )
+        return results
+
+    def put_delay_results(self, rows: Iterable[tuple[str, str, float, str]]) -> None:
+        """Store delay results as ``(fingerprint, url, expires, result)`` rows."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO delay_results (fingerprint, url, expires, result) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def history(self, fingerprints: Iterable[str]) -> dict[str, NodeHistory]:
+        """Get the history of nodes, skipping those never seen.
+
+        Args:
+            fingerprints: The node fingerprints
+
+        Returns:
+            The histories by fingerprint
+        """
+        wanted = list(fingerprints)
+        histories: dict[str, NodeHistory] = {}
+        with self._lock:
+            # Batches stay under SQLite's limit of bound parameters
+            for i in range(0, len(wanted), 500):
+                batch = wanted[i : i + 500]
+                marks = ",".join("?" * len(batch))
+                delays: dict[str, list[Optional[float]]] = {}
+                for fp, delay in self._conn.execute(
+                    f"SELECT fingerprint, delay FROM samples WHERE fingerprint IN ({marks}) ORDER BY run DESC",
+                    batch,
+                ):
+                    delays.setdefault(fp, []).append(delay)
+                for row in self._conn.execute(
+                    f"""
+                    SELECT fingerprint, source, first_seen, last_seen, last_tested, last_alive, consecutive_failures
+                    FROM nodes WHERE fingerprint IN ({marks})
+                    """,
+                    batch,
+                ):
+                    histories[row[0]] = NodeHistory(*row, delays=tuple(delays.get(row[0], ())))
+        return histories
+
+    def prune(self) -> None:
+        """Forget nodes not seen for ``forget_days`` and keep ``max_samples`` per node."""
+        expire = self.run - self.forget_days * 86400
+        with self._lock, self._conn:
+            forgotten = self._conn.execute("DELETE FROM nodes WHERE last_seen < ?", (expire,)).rowcount
+            self._conn.execute("DELETE FROM samples WHERE fingerprint NOT IN (SELECT fingerprint FROM nodes)")
+            self._conn.execute("DELETE FROM delay_results WHERE expires < ?", (time.time(),))
+            self._conn.execute(
+                """
+                DELETE FROM samples WHERE (fingerprint, run) IN (
+                    SELECT fingerprint, run FROM (
+                        SELECT fingerprint, run,
+                            ROW_NUMBER() OVER (PARTITION BY fingerprint ORDER BY run DESC) AS n
+                        FROM samples
+                    ) WHERE n > ?
+                )
+                """,
+                (self.max_samples,),
+            )
+        with self._lock:
+            # The database is carried between runs by the CI cache, keep it compact
+            self._conn.execute("VACUUM")
+        logger.info(f"Node store: {forgotten} nodes unseen for {self.forget_days} days forgotten")
+
+    def log_stats(self) -> None:
+        with self._lock:
+            nodes, seen, tested = self._conn.execute(
+                "SELECT COUNT(*), SUM(last_seen = ?1), SUM(last_tested = ?1) FROM nodes", (self.run,)
+            ).fetchone()
+            samples = self._conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+        logger.info(
+            f"Node store: {nodes} nodes, {seen or 0} seen and {tested or 0} tested this run, "
+            f"{samples} delay samples"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_node_store: Optional[NodeStore] = None
+_node_store_lock = threading.Lock()
+
+
+def get_node_store() -> Optional[NodeStore]:
+    """Get the process-wide node store, or None if it is disabled."""
+    global _node_store
+    if not settings.node_store:
+        return None
+    with _node_store_lock:
+        if _node_store is None:
+            _node_store = NodeStore(
+                f"{settings.cache_dir}/nodes.db",
+                max_samples=settings.node_store_max_samples,
+                forget_days=settings.node_store_forget_days,
+            )
+    return _node_store
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from loguru import logger
+
+from config import settings
+
+# Bump when parse_proxies or convert change what a body turns into
+PARSE_CACHE_VERSION = "4"
+
+
+@dataclass
+class ParseCache:
+    """Content-addressed cache of parsed proxy lists.
+
+    Entries are keyed by a digest of the fetched body and the source options
+    that affect parsing, and hold the converted proxies as a pickle, so an
+    unchanged body is turned back into proxies without any YAML or URI work.
+    """
+
+    path: str
+    max_age_days: int = 7
+    hits: int = 0
+    misses: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(
+        content: str,
+        type: str,
+        method: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> str:
+        """Build the cache key of a body parsed with the given source options."""
+        h = hashlib.blake2b(digest_size=20)
+        for part in (PARSE_CACHE_VERSION, type, method or "", prefix or ""):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        h.update(content.encode("utf-8"))
+        return h.hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def get(self, key: str) -> Optional[list[dict[str, Any]]]:
+        """Get the proxies parsed from a body before.
+
+        Args:
+            key: The key from :meth:`key`
+
+        Returns:
+            A fresh copy of the cached proxies, or None on a miss
+        """
+        file = self._file(key)
+        try:
+            with open(file, "rb") as f:
+                proxies = pickle.load(f)
+            os.utime(file)
+        except FileNotFoundError:
+            proxies = None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable parse cache entry {file}: {e}")
+            proxies = None
+        with self._lock:
+            if proxies is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return proxies
+
+    def put(self, key: str, proxies: list[dict[str, Any]]) -> None:
+        """Store the proxies parsed from a body."""
+        file = self._file(key)
+        try:
+            with open(file + ".tmp", "wb") as f:
+                pickle.dump(proxies, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(file + ".tmp", file)
+        except Exception as e:
+            logger.warning(f"Cannot write parse cache entry {file}: {e}")
+
+    def prune(self) -> None:
+        """Remove entries no source has hit for ``max_age_days``."""
+        expire = time.time() - self.max_age_days * 86400
+        removed = 0
+        for file in os.listdir(self.path):
+            path = os.path.join(self.path, file)
+            if os.path.getmtime(path) < expire:
+                os.remove(path)
+                removed += 1
+        logger.info(
+            f"Parse cache: {self.hits}/{self.hits + self.misses} hits, "
+            f"{removed} stale entries removed"
+        )
+
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Get the process-wide parse cache, or None if it is disabled."""
+    global _parse_cache
+    if not settings.parse_cache:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache(
+                f"{settings.cache_dir}/parse",
+                max_age_days=settings.parse_cache_max_age_days,
+            )
+    return _parse_cache
@@ -0,0 +1,420 @@
+import re
+from typing import Any, Iterable, Optional
+
+from loguru import logger
+from yaml.resolver import Resolver
+
+import yamlio
+
+# Characters that cannot start a plain scalar ("-" can when a non-space follows it)
+_INDICATORS = set("-?:,[]{}#&*!|>'\"%@`")
+
+_FLOW_BREAKS = ("", " ", "\t", ",", "[", "]", "{", "}")
+
+_WS = re.compile(r"[ \t]*")
+# Plain scalar inside a flow collection: stops at ",[]{}?", at ": " and at " #"
+_FLOW_PLAIN = re.compile(
+    r"[^\s,\[\]{}?:#](?:[^\s,\[\]{}?:]|:(?=[^\s,\[\]{}])|[ \t]+(?=[^\s,\[\]{}?:#]|:[^\s,\[\]{}]))*"
+)
+_SINGLE_QUOTED = re.compile(r"'((?:[^'\n]|'')*)'")
+_DOUBLE_QUOTED = re.compile(r'"([^"\\\n]*)"')
+# "key: value" line of a block mapping
+_BLOCK_KEY = re.compile(r"([^\s#'\"{}\[\],&*!|>%@`?:-](?:[^:#]|:(?=\S)|(?<=\S)#)*?)[ \t]*:(?:[ \t]+|$)")
+_DECIMAL = re.compile(r"[-+]?(?:0|[1-9][0-9_]*)$")
+_PROXIES_KEY = re.compile(r"proxies[ \t]*:[ \t]*(?:#.*)?$")
+
+_BOOLS = {
+    "yes": True,
+    "true": True,
+    "on": True,
+    "no": False,
+    "false": False,
+    "off": False,
+}
+
+
+class UnsupportedSyntax(ValueError):
+    """The fast parser does not handle this text, load it with YAML instead."""
+
+
+def _resolve(value: str) -> Any:
+    """Turn a plain scalar into what the YAML loader would construct."""
+    for tag, regexp in Resolver.yaml_implicit_resolvers.get(value[0], ()):
+        if not regexp.match(value):
+            continue
+        if tag == "tag:yaml.org,2002:bool":
+            return _BOOLS[value.lower()]
+        if tag == "tag:yaml.org,2002:null":
+            return None
+        if tag == "tag:yaml.org,2002:int" and _DECIMAL.match(value):
+            return int(value.replace("_", ""))
+        if tag == "tag:yaml.org,2002:float" and ":" not in value and "." in value:
+            lowered = value.lower()
+            if "inf" not in lowered and "nan" not in lowered:
+                return float(value.replace("_", ""))
+        # Octal, sexagesimal, timestamps, merge keys...
+        raise UnsupportedSyntax(value)
+    return value
+
+
+def _quoted(text: str, pos: int) -> tuple[str, int]:
+    if text[pos] == "'":
+        m = _SINGLE_QUOTED.match(text, pos)
+        if m:
+            return m.group(1).replace("''", "'"), m.end()
+    else:
+        m = _DOUBLE_QUOTED.match(text, pos)
+        if m:
+            return m.group(1), m.end()
+    # Escapes, or a scalar continued on the next line
+    raise UnsupportedSyntax(text)
+
+
+def _str_tag(text: str, pos: int) -> int:
+    """Get the position after a ``!<str>`` tag at ``pos``, -1 if there is none."""
+    if text.startswith("!<str>", pos) and text[pos + 6 : pos + 7] in (" ", "\t"):
+        return _WS.match(text, pos + 6).end()
+    return -1
+
+
+def _flow_node(text: str, pos: int) -> tuple[Any, int]:
+    """Parse the flow node at ``pos``, returning it and the position after it."""
+    tagged = _str_tag(text, pos)
+    if tagged >= 0:
+        pos = tagged
+    ch = text[pos] if pos < len(text) else ""
+    if tagged >= 0 and (not ch or ch in "{[,}]"):
+        raise UnsupportedSyntax(text)
+    if ch == "{":
+        return _flow_mapping(text, pos)
+    if ch == "[":
+        return _flow_sequence(text, pos)
+    if ch in ("'", '"'):
+        return _quoted(text, pos)
+    if ch in ",}]":
+        return None, pos
+    if ch in _INDICATORS and not (ch == "-" and text[pos + 1 : pos + 2] not in _FLOW_BREAKS):
+        raise UnsupportedSyntax(text)
+    m = _FLOW_PLAIN.match(text, pos)
+    if not m:
+        raise UnsupportedSyntax(text)
+    return m.group() if tagged >= 0 else _resolve(m.group()), m.end()
+
+
+def _flow_mapping(text: str, pos: int) -> tuple[dict, int]:
+    mapping = {}
+    pos = _WS.match(text, pos + 1).end()
+    while True:
+        if pos >= len(text):
+            raise UnsupportedSyntax(text)
+        if text[pos] == "}":
+            return mapping, pos + 1
+        key, pos = _flow_node(text, pos)
+        if isinstance(key, (dict, list)):
+            raise UnsupportedSyntax(text)
+        pos = _WS.match(text, pos).end()
+        value = None
+        if text.startswith(":", pos):
+            pos = _WS.match(text, pos + 1).end()
+            value, pos = _flow_node(text, pos)
+            pos = _WS.match(text, pos).end()
+        mapping[key] = value
+        if text.startswith(",", pos):
+            pos = _WS.match(text, pos + 1).end()
+        elif not text.startswith("}", pos):
+            raise UnsupportedSyntax(text)
+
+
+def _flow_sequence(text: str, pos: int) -> tuple[list, int]:
+    sequence = []
+    pos = _WS.match(text, pos + 1).end()
+    while True:
+        if pos >= len(text):
+            raise UnsupportedSyntax(text)
+        if text[pos] == "]":
+            return sequence, pos + 1
+        value, pos = _flow_node(text, pos)
+        pos = _WS.match(text, pos).end()
+        if text.startswith(":", pos):
+            raise UnsupportedSyntax(text)  # Single-pair mapping
+        sequence.append(value)
+        if text.startswith(",", pos):
+            pos = _WS.match(text, pos + 1).end()
+        elif not text.startswith("]", pos):
+            raise UnsupportedSyntax(text)
+
+
+def _line_end(text: str, pos: int) -> None:
+    """Make sure only blanks or a comment follow ``pos``."""
+    pos = _WS.match(text, pos).end()
+    if pos < len(text) and (text[pos] != "#" or text[pos - 1] not in " \t"):
+        raise UnsupportedSyntax(text)
+
+
+def _block_scalar(text: str) -> Any:
+    """Parse the value part of a block line."""
+    tagged = _str_tag(text, 0)
+    if tagged >= 0:
+        text = text[tagged:]
+        if not text or text[0] in "{[":
+            raise UnsupportedSyntax(text)
+    if text[0] in "{[":
+        value, pos = _flow_node(text, 0)
+        _line_end(text, pos)
+        return value
+    if text[0] in ("'", '"'):
+        value, pos = _quoted(text, 0)
+        _line_end(text, pos)
+        return value
+    if text[0] in _INDICATORS and not (text[0] == "-" and len(text) > 1 and text[1] not in " \t"):
+        raise UnsupportedSyntax(text)
+    cut = text.find(" #")
+    if cut >= 0:
+        text = text[:cut]
+    text = text.rstrip()
+    if ": " in text or text.endswith(":") or "\t#" in text:
+        raise UnsupportedSyntax(text)
+    return text if tagged >= 0 else _resolve(text)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _block_node(lines: list[str], i: int, indent: int) -> tuple[Any, int]:
+    """Parse the block collection whose lines start at ``lines[i]`` with ``indent``."""
+    if lines[i].startswith("- ", indent) or lines[i].rstrip() == " " * indent + "-":
+        return _block_sequence(lines, i, indent)
+    return _block_mapping(lines, i, indent)
+
+
+def _block_value(lines: list[str], i: int, indent: int, rest: str) -> tuple[Any, int]:
+    """Parse the value after "key:" or "-", possibly nested on the following lines."""
+    if rest:
+        if i + 1 < len(lines) and _indent(lines[i + 1]) > indent:
+            raise UnsupportedSyntax(lines[i + 1])  # Multi-line scalar
+        return _block_scalar(rest), i + 1
+    if i + 1 >= len(lines):
+        return None, i + 1
+    child = _indent(lines[i + 1])
+    if child > indent:
+        return _block_node(lines, i + 1, child)
+    return None, i + 1
+
+
+def _block_mapping(lines: list[str], i: int, indent: int) -> tuple[dict, int]:
+    mapping = {}
+    while i < len(lines):
+        line = lines[i]
+        line_indent = _indent(line)
+        if line_indent < indent:
+            break
+        if line_indent > indent:
+            raise UnsupportedSyntax(line)
+        m = _BLOCK_KEY.match(line, indent)
+        if not m:
+            raise UnsupportedSyntax(line)
+        key = _resolve(m.group(1).rstrip())
+        rest = line[m.end() :].rstrip()
+        if rest.startswith("#"):
+            rest = ""
+        if not rest and i + 1 < len(lines) and _indent(lines[i + 1]) == indent and lines[i + 1].startswith("-", indent):
+            # A sequence may sit at the same indent as its key
+            value, i = _block_sequence(lines, i + 1, indent)
+        else:
+            value, i = _block_value(lines, i, indent, rest)
+        mapping[key] = value
+    return mapping, i
+
+
+def _block_sequence(lines: list[str], i: int, indent: int) -> tuple[list, int]:
+    sequence = []
+    while i < len(lines):
+        line = lines[i]
+        line_indent = _indent(line)
+        if line_indent < indent or not line.startswith("-", indent):
+            break
+        if line_indent > indent:
+            raise UnsupportedSyntax(line)
+        rest = line[indent + 1 :]
+        if rest and rest[0] not in " \t":
+            raise UnsupportedSyntax(line)
+        rest = rest.strip()
+        if _BLOCK_KEY.match(rest) and not rest.startswith(("{", "[", "'", '"')):
+            # "- key: value" starts a mapping indented past the dash
+            child = indent + 1 + _indent(line[indent + 1 :])
+            item_lines = [" " * child + line[child:]] + lines[i + 1 :]
+            value, used = _block_mapping(item_lines, 0, child)
+            i += used
+        else:
+            value, i = _block_value(lines, i, indent, rest)
+        sequence.append(value)
+    return sequence, i
+
+
+def parse_item(lines: list[str]) -> Any:
+    """Parse one item of a block sequence without the YAML loader.
+
+    Args:
+        lines: Lines of the item, the first one starting with "- " at column 0
+
+    Returns:
+        The item, as the YAML loader would construct it
+
+    Raises:
+        UnsupportedSyntax: If the item uses YAML the fast path does not handle
+    """
+    first = lines[0]
+    if first.startswith("- {") and len(lines) == 1:
+        # The common one-line "- {name: ..., server: ...}" flow mapping
+        value, pos = _flow_mapping(first, 2)
+        _line_end(first, pos)
+        return value
+    value, used = _block_sequence(lines, 0, 0)
+    if used != len(lines) or len(value) != 1:
+        raise UnsupportedSyntax(first)
+    return value[0]
+
+
+def _load_run(items: list[list[str]], url: str) -> list[Any]:
+    """Load items the fast path gave up on with YAML, one document for the whole run."""
+    try:
+        return yamlio.load("".join(line + "\n" for item in items for line in item)) or []
+    except Exception:
+        # Only skip the broken items
+        loaded = []
+        for item in items:
+            try:
+                loaded.extend(yamlio.load("".join(line + "\n" for line in item)) or [])
+            except Exception as e:
+                logger.debug(f"Skip unparsable proxy from {url}: {e}")
+        return loaded
+
+
+class ProxyListParser:
+    """Pick the top-level ``proxies:`` list out of a clash config line by line.
+
+    Items are parsed by the fast path of :func:`parse_item`, and runs of
+    items it does not handle by the YAML loader. Other top-level sections
+    such as ``proxy-groups:`` and ``rules:`` are skipped without parsing.
+    ``found`` tells whether a block-style ``proxies:`` list was seen, and
+    ``unsupported`` whether the document needs a full YAML load instead,
+    e.g. for a flow-style ``proxies: [...]``.
+    """
+
+    def __init__(self, url: str = "") -> None:
+        self.url = url
+        self.found = False
+        self.unsupported = False
+        self.fast = 0  # Items parsed by the fast path
+        self.slow = 0  # Items loaded with YAML
+        self._in_proxies = False
+        self._indent: Optional[int] = None
+        self._item: list[str] = []
+        # Blank and comment lines after the current item's last line, part of
+        # it only if more of the item follows, e.g. inside a quoted scalar
+        self._pending: list[str] = []
+
+    def feed(self, lines: Iterable[str]) -> list[dict[str, Any]]:
+        """Parse a batch of lines.
+
+        Returns:
+            The proxies completed by these lines
+        """
+        items = []
+        for line in lines:
+            stripped = line.strip()
+            if not stripped or stripped[0] == "#":
+                if self._item:
+                    self._pending.append(line)
+                continue
+            if line.startswith(("---", "...")):
+                self.unsupported = True  # Several documents
+                continue
+            pending, self._pending = self._pending, []
+            if line[0] not in " \t-":
+                # A top-level key ends the previous section
+                if self._item:
+                    items.append(self._item)
+                    self._item = []
+                self._in_proxies = bool(_PROXIES_KEY.match(line))
+                if self._in_proxies:
+                    # A repeated key would replace the first list
+                    self.unsupported |= self.found
+                    self.found = True
+                elif line.startswith("proxies"):
+                    self.unsupported = True
+                self._indent = None
+                continue
+            if not self._in_proxies:
+                continue
+
+            indent = _indent(line)
+            if self._indent is None:
+                self._indent = indent
+            if indent == self._indent and line.startswith("-", indent):
+                if self._item:
+                    items.append(self._item)
+                self._item = []
+            else:
+                self._item.extend(p[min(_indent(p), self._indent) :] for p in pending)
+            self._item.append(line[min(indent, self._indent) :])
+        return self._parse(items)
+
+    def close(self) -> list[dict[str, Any]]:
+        """Parse the last item.
+
+        Returns:
+            The proxies completed by the end of the document
+        """
+        items = [self._item] if self._item else []
+        self._item = []
+        self._pending = []
+        return self._parse(items)
+
+    def _parse(self, items: list[list[str]]) -> list[dict[str, Any]]:
+        proxies = []
+        run: list[list[str]] = []
+        for item in items:
+            try:
+                proxy = parse_item(item)
+            except UnsupportedSyntax:
+                run.append(item)
+                continue
+            if run:
+                proxies.extend(_load_run(run, self.url))
+                self.slow += len(run)
+                run = []
+            proxies.append(proxy)
+            self.fast += 1
+        if run:
+            proxies.extend(_load_run(run, self.url))
+            self.slow += len(run)
+
+        result = []
+        for p in proxies:
+            if not isinstance(p, dict):
+                continue
+            if "password" in p and not isinstance(p["password"], str):
+                p["password"] = str(p["password"])
+            result.append(p)
+        return result
+
+
+def load_proxies(content: str, url: str = "") -> Optional[list[dict[str, Any]]]:
+    """Get the proxies of a clash config without loading the whole document.
+
+    Args:
+        content: The clash config
+        url: Where the config came from, for logging
+
+    Returns:
+        The proxies, or None if the document has no block-style ``proxies:``
+        list the line parser can handle
+    """
+    parser = ProxyListParser(url)
+    proxies = parser.feed(content.splitlines())
+    proxies.extend(parser.close())
+    if parser.unsupported or not parser.found:
+        return None
+    return proxies
@@ -0,0 +1,49 @@
+import yaml
+
+from proxylist import load_proxies
+
+MULTI_LINE = """\
+proxies:
+  - {name: a, server: a.example.com, port: 443}
+
+  # Blank and comment lines between items are skipped
+  - name: b
+    server: b.example.com
+
+    port: 443
+    _extra:
+      error: 'time="2025-09-06T08:43:51+08:00" level=fatal msg="missing obfs password"
+
+        '
+  - name: c
+    server: c.example.com
+    port: 443
+    note: "first
+
+      third
+    # not a comment
+      end"
+# A top-level comment
+rules: []
+"""
+
+
+def test_multi_line_quoted_value_matches_yaml():
+    proxies = load_proxies(MULTI_LINE)
+    assert proxies == yaml.full_load(MULTI_LINE)["proxies"]
+    assert proxies[1]["_extra"]["error"].endswith('password"\n')
+    assert proxies[2]["note"] == "first\nthird # not a comment end"
+
+
+def test_problem_yml_sample_matches_yaml():
+    content = (
+        "proxies:\n"
+        "  - name: x\n"
+        "    server: x.example.com\n"
+        "    port: 8443\n"
+        "    _extra:\n"
+        "      error: \"level=fatal msg=\\\"Parse config error\\\"\n"
+        "\n"
+        "        \"\n"
+    )
+    assert load_proxies(content) == yaml.full_load(content)["proxies"]
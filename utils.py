@@ -1,11 +1,16 @@
 import base64
 import binascii
+import gzip
+import os
 import random
 import re
+import tempfile
 
 import requests
 import yaml
 
+import yamlio
+
 from config import settings
 
 
@@ -40,11 +45,32 @@ def b64decodes_safe(s: str):
 def read_yaml(file_path: str) -> dict:
     try:
         with open(file_path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+            return yamlio.load(f)
     except yaml.YAMLError:
         raise
 
 
+def write_gzip(path: str, text: str) -> None:
+    """Write text gzip-compressed to a file, atomically.
+
+    The data goes to a unique temporary file in the same directory first and
+    then replaces the file, so concurrent writers of one path and crashes
+    never leave a truncated file behind.
+
+    Args:
+        path: The file to write
+        text: The text, encoded as UTF-8
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(text.encode("utf-8")))
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
 def is_base64(s):
     base64_pattern = re.compile(r"^[A-Za-z0-9+/]*={0,2}$")
 
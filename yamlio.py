@@ -0,0 +1,129 @@
+import re
+from typing import IO, Any, Iterator, Optional, Union
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as _BaseDumper
+    from yaml import CSafeLoader as _BaseLoader
+except ImportError:  # PyYAML built without LibYAML
+    from yaml import SafeDumper as _BaseDumper
+    from yaml import SafeLoader as _BaseLoader
+
+LIBYAML = _BaseLoader is not yaml.SafeLoader
+
+# LibYAML escapes characters beyond the BMP, such as the emoji flags in proxy names
+_ASTRAL_ESCAPE = re.compile(r"(?<!\\)((?:\\\\)*)\\U([0-9A-Fa-f]{8})")
+
+
+class Loader(_BaseLoader):
+    """Safe loader, backed by LibYAML when available.
+
+    Also reads the ``!<str>`` tag some subscription generators put before
+    numeric passwords and names as a plain string.
+    """
+
+
+Loader.add_constructor("str", Loader.construct_yaml_str)
+
+
+class Dumper(_BaseDumper):
+    """Safe dumper, backed by LibYAML when available.
+
+    Also writes dict, list and str subclasses such as the Dynaconf boxes
+    and tuples as their plain counterparts.
+    """
+
+
+Dumper.add_multi_representer(dict, Dumper.represent_dict)
+Dumper.add_multi_representer(list, Dumper.represent_list)
+Dumper.add_multi_representer(tuple, Dumper.represent_list)
+
+
+def _represent_str(dumper: Dumper, data: str) -> yaml.ScalarNode:
+    # A literal \U is written double-quoted, i.e. as \\U, so that the only
+    # unescaped \U in the output are the escapes _unescape puts back
+    if "\\U" in data:
+        return dumper.represent_scalar("tag:yaml.org,2002:str", str(data), style='"')
+    return dumper.represent_str(data)
+
+
+Dumper.add_representer(str, _represent_str)
+Dumper.add_multi_representer(str, _represent_str)
+
+
+def _unescape(text: str) -> str:
+    if "\\U" not in text:
+        return text
+    return _ASTRAL_ESCAPE.sub(lambda m: m.group(1) + chr(int(m.group(2), 16)), text)
+
+
+class _UnescapingWriter:
+    """Text stream wrapper putting escaped astral characters back as they are.
+
+    The result is still a valid double-quoted scalar. An escape split
+    between two writes is held back until the next one.
+    """
+
+    def __init__(self, stream: IO) -> None:
+        self.stream = stream
+        self.encoding = getattr(stream, "encoding", None) or "utf-8"
+        self._pending = ""
+
+    def write(self, data: str) -> None:
+        data = self._pending + data
+        self._pending = ""
+        cut = data.rfind("\\", max(0, len(data) - 10))
+        if cut >= 0:
+            while cut > 0 and data[cut - 1] == "\\":
+                cut -= 1
+            data, self._pending = data[:cut], data[cut:]
+        self.stream.write(_unescape(data))
+
+    def flush(self) -> None:
+        self.stream.write(_unescape(self._pending))
+        self._pending = ""
+        if hasattr(self.stream, "flush"):
+            self.stream.flush()
+
+
+def load(stream: Union[str, bytes, IO]) -> Any:
+    """Load a YAML document.
+
+    Args:
+        stream: The document, or a file object read incrementally
+
+    Returns:
+        The document
+
+    Raises:
+        yaml.YAMLError: If the document is not valid YAML
+    """
+    return yaml.load(stream, Loader=Loader)
+
+
+def load_all(stream: Union[str, bytes, IO]) -> Iterator[Any]:
+    """Lazily load every document of a YAML stream."""
+    return yaml.load_all(stream, Loader=Loader)
+
+
+def dump(data: Any, stream: Optional[IO] = None, **kwargs) -> Optional[str]:
+    """Dump data as YAML with unicode kept as is.
+
+    Args:
+        data: The data to dump
+        stream: File object written incrementally, None to return a string
+        **kwargs: Options passed on to ``yaml.dump``, e.g. ``sort_keys``
+
+    Returns:
+        The YAML text if no stream was given
+    """
+    kwargs.setdefault("allow_unicode", True)
+    if not LIBYAML or not kwargs["allow_unicode"]:
+        return yaml.dump(data, stream, Dumper=Dumper, **kwargs)
+    if stream is None:
+        return _unescape(yaml.dump(data, Dumper=Dumper, **kwargs))
+    writer = _UnescapingWriter(stream)
+    yaml.dump(data, writer, Dumper=Dumper, **kwargs)
+    writer.flush()
+    return None